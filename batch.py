@@ -0,0 +1,207 @@
+#!/bin/env python
+# vim: ts=4:sw=4
+""" Grades a batch of submissions.
+
+Reads one JSON submission per line (from a file or stdin):
+
+    {"id": "a1", "code": "...", "rubric": [{"name": "Sprite", "op": ">=", "value": 2}]}
+
+and writes one JSON result per line as each one is finished. See
+lib/analysis/worker.py for the shape of a result.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from lib.analysis import worker
+
+
+def submissions(lines):
+    """ Yields each submission (or the error reading it) by its line.
+    """
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            submission = json.loads(line)
+            if not isinstance(submission, dict):
+                raise ValueError("expected an object")
+        except ValueError as e:
+            yield None, {'id': None, 'ok': False, 'error': f'line {number}: {e}'}
+        else:
+            yield submission, None
+
+
+class Batch:
+    """ Fans submissions out to a pool of workers with the prelude loaded.
+    """
+
+    def __init__(self, jobs=None, in_flight=None, ordered=False, prelude=None, cache_dir=None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.in_flight = in_flight or self.jobs * 4
+        self.ordered = ordered
+        self.prelude = prelude
+        self.cache_dir = cache_dir
+        self.pool = None
+
+    def _pool(self):
+        if self.pool is None:
+            self.pool = self._executor(self.jobs)
+        return self.pool
+
+    def _executor(self, workers):
+        return ProcessPoolExecutor(max_workers=workers,
+                                   initializer=worker.initialize,
+                                   initargs=(self.prelude, self.cache_dir,))
+
+    def _restart(self):
+        """ Throws away the pool, once a worker died and took it down.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def _submit(self, submission):
+        try:
+            return self._pool().submit(worker.analyze, submission)
+        except BrokenProcessPool:
+            # A worker died (and took the pool with it): start over
+            self._restart()
+            return self._pool().submit(worker.analyze, submission)
+
+    def _alone(self, submission):
+        """ Analyzes the given submission in a pool of its own, so if it takes
+        its worker down, nothing else is lost.
+        """
+        executor = self._executor(1)
+        try:
+            return executor.submit(worker.analyze, submission).result()
+        except Exception as e:
+            return worker.failed(submission, e)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, lines):
+        """ Yields the result of every submission in the given lines.
+
+        At most `in_flight` submissions are queued (or, when ordered, waiting
+        for an earlier one to finish) at any time.
+        """
+        pending = {}
+        finished = {}
+        index = 0
+        emitted = 0
+
+        try:
+            for submission, error in submissions(lines):
+                if error is not None:
+                    finished[index] = error
+                else:
+                    pending[self._submit(submission)] = (index, submission, False,)
+                index += 1
+
+                while len(pending) + len(finished) >= self.in_flight:
+                    emitted = yield from self._drain(pending, finished, emitted)
+
+            while pending or finished:
+                emitted = yield from self._drain(pending, finished, emitted)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+
+    def _drain(self, pending, finished, emitted):
+        """ Yields whatever results are ready, waiting for at least one.
+
+        :returns: The number of results emitted, in order, so far.
+        """
+        if pending and (not self.ordered or emitted not in finished):
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = []
+            for future in done:
+                index, submission, retried = pending.pop(future)
+                try:
+                    finished[index] = future.result()
+                except BrokenProcessPool:
+                    broken.append((index, submission, retried,))
+                except Exception as e:
+                    finished[index] = worker.failed(submission, e)
+
+            if broken:
+                self._recover(broken, pending, finished)
+
+        if self.ordered:
+            while emitted in finished:
+                yield finished.pop(emitted)
+                emitted += 1
+        else:
+            for index in sorted(finished):
+                yield finished.pop(index)
+                emitted += 1
+
+        return emitted
+
+    def _recover(self, broken, pending, finished):
+        """ Starts over after a worker died, taking every submission in
+        progress down with it.
+
+        Only one of those submissions killed the worker, so each is tried
+        again. A submission that was already being tried again when the pool
+        broke is then analyzed alone, and only fails if it kills that worker
+        too.
+        """
+        # Every other submission in progress was lost as well
+        for future in list(pending):
+            if future.done() and not isinstance(future.exception(), BrokenProcessPool):
+                continue
+            broken.append(pending.pop(future))
+
+        self._restart()
+
+        for index, submission, retried in sorted(broken, key=lambda item: item[0]):
+            if retried:
+                finished[index] = self._alone(submission)
+            else:
+                pending[self._submit(submission)] = (index, submission, True,)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('input', nargs='?', default='-',
+                        help="JSONL file of submissions ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="where to write the JSONL results ('-' for stdout)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument('--in-flight', type=int, default=None,
+                        help="most submissions in progress at once (default: 4 per worker)")
+    parser.add_argument('--ordered', action='store_true',
+                        help="write results in input order instead of as they finish")
+    parser.add_argument('--prelude', nargs='+', default=worker.PRELUDE_FILES,
+                        help="library files every submission runs against")
+    args = parser.parse_args(argv)
+
+    batch = Batch(jobs=args.jobs, in_flight=args.in_flight, ordered=args.ordered, prelude=args.prelude)
+
+    source = sys.stdin if args.input == '-' else open(args.input, 'r')
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        for result in batch.run(source):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,14 @@
 #!/bin/env python
 
 from lib.analysis.analyzer import Analyzer
+from lib.analysis.prelude import Prelude
 from lib.nodes.class_node import ClassNode
 from lib.nodes.function_node import FunctionNode
 
 code = open('u3l23_01.js', 'r').read()
 code = open('simple.js', 'r').read()
-a = Analyzer(code)
-math = open('math.js', 'r').read()
-a.augment(math)
-precode = open('precode.js', 'r').read()
-a.augment(precode)
+prelude = Prelude.fromFiles(['math.js', 'precode.js'])
+a = Analyzer(code, prelude=prelude)
 
 print(a)
 context = a.annotate()
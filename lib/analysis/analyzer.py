@@ -1,9 +1,6 @@
 # vim: ts=4:sw=4
-import re
-
-from functools import partial
-
 from esprima import parseScript
+from esprima.objects import Object as EsprimaObject
 
 # Structural Nodes
 from lib.nodes.program_node import ProgramNode
@@ -14,57 +11,296 @@ from lib.nodes.method_node import MethodNode
 from lib.nodes.property_node import PropertyNode
 from lib.nodes.class_node import ClassNode
 
+from lib.analysis.budget import Budget
+from lib.analysis.call_graph import CallGraph
+from lib.analysis.diagnostics import Diagnostics
+from lib.analysis.doc_string import DocString
+from lib.analysis.overlay import Overlay
+from lib.analysis.parsing import PARSE_OPTIONS, index_comments
+from lib.analysis.walker import Walker
+
 # Values
 from lib.values.value import Value
 from lib.values.raised import Raised
+from lib.values.reference import Reference
 
 
 class Analyzer:
     """
     """
 
-    # Regular expression to parse @<token> sequences as part of jsdoc strings.
-    DOCSTRING_RE = r'@(?P<token>[a-zA-Z]+)(?:\s+{(?P<type>[a-zA-Z]+)})?(?:\s+(?P<description>.+))?'
+    # Bump whenever a change affects the results of an analysis, so cached
+    # results are no longer considered.
+    VERSION = 10
+
+    # Options passed along to esprima for every parse.
+    PARSE_OPTIONS = PARSE_OPTIONS
+
+    # Loop iterations after which the state at the head of a loop is widened
+    WIDEN_AFTER = 3
 
-    def __init__(self, code):
+    # Loop iterations after which the analysis of a loop gives up
+    LOOP_LIMIT = 64
+
+    def __init__(self, code, prelude=None, unroll=0, budget=None, allocation_depth=1):
         """ Constructs a full analysis context.
+
+        The optional `prelude` is a Prelude whose expanded snapshot is used as
+        the starting context instead of parsing the library code again.
+
+        Loops are analyzed until the state at their head stops changing. With
+        `unroll`, up to that many iterations of a loop whose condition is known
+        to hold are instead followed exactly, one after the other.
+
+        Each annotation is limited by the given Budget (or the default one).
+        Whether it was cut short is then noted by `budget.partial`.
+
+        Objects are told apart by where they are allocated: the call site and
+        up to `allocation_depth` of the call sites that led to it. The same
+        call made from several sites shares its summary, and so the objects
+        it allocates.
         """
         self.code = code
-        self.precode = []
+        self.prelude = prelude
+        self.unroll = unroll
+        self.budget = budget or Budget()
+        self.allocation_depth = allocation_depth
+        self.base = None
         self.ast = None
-        self.precodeast = None
         self.context = None
-        self.docstring_re = None
+        self.comment_indices = {}
+
+        # Function summaries (per annotation) and those being recorded
+        self.summaries = {}
+        self.recording = []
+
+        # The call graph of the program (extending the one of the base) and
+        # the recursive components (by index) whose summaries are being solved
+        self.graph = None
+        self.base_graph = None
+        self.fixpoints = {}
+
+        # The call sites being followed and the objects allocated so far, by
+        # allocation site
+        self.callers = []
+        self.heap = {}
+
+        # The values variables held before the writes of each open journal
+        self.journals = []
+
+        # The side effects held back by each loop being iterated
+        self.deferred = []
+
+        # Every exception the last annotation found might be raised
+        self.diagnostics = Diagnostics()
 
     def augment(self, code):
         """ Adds some pre-code to reveal the type information necessary to
             understand the rest of the code.
+
+        Only the new chunk is parsed and expanded. It is added to the frozen
+        base context every later annotation starts from.
         """
-        self.precode.append(code)
+        ast = parseScript(code, Analyzer.PARSE_OPTIONS)
+
+        base = self._base()
+        if base is None:
+            base = ProgramNode(ast)
 
-        # Invalidate the precode AST
-        self.precodeast = None
+        self._expand(ast, code, ast, base)
+
+        # Freeze the new declarations so each analysis works on its own copy
+        base.freeze()
+        self.base = base
+        self.base_graph = None
 
     def annotate(self, reparse=False):
         """ Go through and annotate the variables with their types.
         """
 
         # If requested, throw away the old structure
-        if reparse:
+        if reparse and self.ast is not None:
+            self.comment_indices.pop(id(self.ast), None)
             self.ast = None
 
+        # Parsing counts toward the deadline
+        self.budget.start()
+
         # Parse all code. This stores its results in AST properties
         self._parse()
 
-        # Go through all ASTs and annotate functions, classes, etc
-        self._expand(self.precodeast, self.precodetext)
+        # Summaries refer to the structure of the last annotation
+        self.summaries = {}
+        self.recording = []
+        self.journals = []
+        self.deferred = []
+        self.fixpoints = {}
+        self.callers = []
+        self.heap = {}
+        self.diagnostics = Diagnostics()
+
+        # Start from a private view of the prelude and pre-code
+        base = self._base()
+        if base is None:
+            self.context = ProgramNode(self.ast)
+        else:
+            self.context = Overlay(base).root
+        self.context.diagnostics = self.diagnostics
+
+        # Go through the AST and annotate functions, classes, etc
         self._expand(self.ast, self.text, self.ast, self.context)
 
+        # Find which functions are recursive, which are analyzed differently
+        self.graph = CallGraph(self.context, self._baseGraph())
+
         # Do runtime analysis
         self._annotate(self.ast, self.text, self.ast, self.context)
 
         return self.context
 
+    def _base(self):
+        """ Returns the expanded context holding the prelude and any pre-code.
+        """
+        if self.base is None and self.prelude is not None:
+            # Extend a copy of the shared prelude with our own pre-code
+            self.base = self.prelude.context().fork()
+            self.base.freeze()
+
+        return self.base
+
+    def _baseGraph(self):
+        """ Returns the CallGraph of the base context, built once.
+        """
+        if self.base_graph is None and self.base is not None:
+            prelude = None
+            if self.prelude is not None:
+                prelude = self.prelude.callGraph()
+            self.base_graph = CallGraph(self.base, prelude)
+
+        return self.base_graph
+
+    def summarize(self, key, summary, annotate):
+        """ Records the given Summary while walking `annotate`.
+
+        Like `annotate`, this is a generator handled by a Walker. The summary
+        is cached under `key` if the call turned out to be pure.
+        """
+        for outer in self.recording:
+            outer.enter(summary.callee)
+
+        self.recording.append(summary)
+        try:
+            summary.value = yield from annotate()
+        finally:
+            self.recording.pop()
+
+        if summary.pure:
+            self.summaries[key] = summary
+
+        return summary.value
+
+    def _effect(self, function, *args):
+        """ Performs a side effect that must be replayed by a cached summary.
+
+        While a loop is iterated to its fixpoint, the effect is instead held
+        back until the loop is done (see _defer).
+        """
+        if self.deferred:
+            self.deferred[-1].append((function, args,))
+            return None
+
+        ret = function(*args)
+        for summary in self.recording:
+            summary.effect(function, args)
+
+        return ret
+
+    def _defer(self):
+        """ Starts holding back side effects, so they are not counted again by
+        every iteration of a loop.
+
+        :returns: The list of `(function, args)` held back.
+        """
+        deferred = []
+        self.deferred.append(deferred)
+        return deferred
+
+    def _release(self, deferred):
+        """ Stops holding back side effects in the given list.
+        """
+        for i in range(len(self.deferred) - 1, -1, -1):
+            if self.deferred[i] is deferred:
+                del self.deferred[i]
+                break
+
+    def _calling(self):
+        """ Returns the calling context objects are allocated within: the last
+        `allocation_depth` call sites being followed.
+        """
+        if not self.allocation_depth:
+            return ()
+
+        return tuple(self.callers[-self.allocation_depth:])
+
+    def _instance(self, node, klass):
+        """ Returns the object of the given class allocated by the given call
+        site within the current calling context.
+        """
+        key = (node, self._calling(),)
+        ret = self.heap.get(key)
+        if ret is None:
+            ret = Reference(node, klass, klass.annotation)
+            self.heap[key] = ret
+
+        ret.allocate()
+        self._allocate(ret)
+        return ret
+
+    def _allocate(self, reference):
+        """ Notes the creation of an object.
+        """
+        for summary in self.recording:
+            summary.allocate(reference)
+
+    def _load(self, variable):
+        """ Notes that the value of the given variable was read.
+        """
+        for summary in self.recording:
+            summary.load(variable)
+
+    def _store(self, target):
+        """ Notes that the given variable (or object) was written.
+        """
+        for summary in self.recording:
+            summary.store(target)
+
+    def _assign(self, variable, value):
+        """ Sets the value of the given variable, noting it in open journals.
+        """
+        for journal in self.journals:
+            if variable not in journal:
+                journal[variable] = variable.get_value()
+
+        variable.set_value(self.budget.cap(value))
+
+    def _journal(self):
+        """ Starts noting the value of every variable before it is written.
+
+        :returns: The journal, a dict of variables to their previous Value.
+        """
+        journal = {}
+        self.journals.append(journal)
+        return journal
+
+    def _close(self, journal):
+        """ Stops noting writes in the given journal.
+        """
+        # Journals hold Values, so find ours by identity rather than equality
+        for i in range(len(self.journals) - 1, -1, -1):
+            if self.journals[i] is journal:
+                del self.journals[i]
+                break
+
     def parseDocstring(self, comment: str):
         """ Parses a JavaScript docstring.
 
@@ -76,31 +312,7 @@ class Analyzer:
         :rtype: dict
         """
 
-        ret = {}
-
-        # Lazy compile the regular expression
-        self.docstring_re = self.docstring_re or re.compile(Analyzer.DOCSTRING_RE)
-
-        # Take the comment block and split by line searching for jsdoc context.
-        for line in comment.split('\n'):
-            # Match against the expression
-            line = line.strip()
-            match = re.search(self.docstring_re, line)
-
-            # Skip when no match was found
-            if match is None: continue
-
-            # Parse out the @returns token
-            if match['token'] == 'returns':
-                ret['returns'] = ret.get('returns', {})
-                for key in ['type', 'description']:
-                    try:
-                        ret['returns'][key] = match[key]
-                    except IndexError:
-                        pass
-
-        # Return a dict containing metadata representing the docstrings
-        return ret
+        return DocString.parse(comment).to_dict()
 
     def _expand(self, node, text, ast=None, context=None):
         """ Determines the structural aspects of the code.
@@ -116,76 +328,94 @@ class Analyzer:
             context = ProgramNode(ast)
             self.context = context
 
-        # Go through the nodes
-        if node.type == "Program":
-            for subnode in node.body:
-                self._expand(subnode, text, ast, context)
+        return Walker(self, text, ast).walk('expand', node, context)
 
-        elif node.type == "ClassDeclaration":
-            # Create the class
-            klass = ClassNode(node, parent=context)
-            if node.body:
-                self._expand(node.body, text, ast, klass)
+    @staticmethod
+    @Walker.handles('expand', None)
+    def _expandOther(walk, node, context):
+        return context
 
-            context.add_class(node.id.name, klass)
+    @staticmethod
+    @Walker.handles('expand', 'Program', 'ClassBody')
+    def _expandBody(walk, node, context):
+        for subnode in node.body:
+            yield ('expand', subnode, context)
 
-        elif node.type == "ClassBody":
-            for subnode in node.body:
-                self._expand(subnode, text, ast, context)
+        return context
 
-        elif node.type == "MethodDefinition":
-            # Add method to class
-            annotation = self._annotateFunction(node, text, ast, context)
+    @staticmethod
+    @Walker.handles('expand', 'ClassDeclaration')
+    def _expandClass(walk, node, context):
+        # Create the class
+        klass = ClassNode(node, parent=context)
+        if node.body:
+            yield ('expand', node.body, klass)
 
-            if node.static:
-                method = FunctionNode(node, parent=context, annotation=annotation)
-            else:
-                method = MethodNode(node, parent=context, annotation=annotation)
-
-            name = None
-            if node.key:
-                name = node.key.name
-
-            if node.static:
-                context.add_function(name, method)
-            elif node.kind == "set" or node.kind == "get":
-                # Property
-                # See if this property already exists
-                prop = (context.properties or {}).get(name)
-
-                if not (prop and isinstance(prop, PropertyNode)):
-                    # Create the property
-                    prop = PropertyNode(node, writable=True, parent=context, annotation=annotation)
-                if node.kind == "set":
-                    prop.add_setter(method)
-                elif node.kind == "get":
-                    prop.add_getter(method)
-
-                context.add_property(name, prop)
+        context.add_class(node.id.name, klass)
+        return context
+
+    @staticmethod
+    @Walker.handles('expand', 'MethodDefinition')
+    def _expandMethod(walk, node, context):
+        # Add method to class
+        annotation = walk.analyzer._annotateFunction(node, walk.text, walk.ast, context)
+
+        if node.static:
+            method = FunctionNode(node, parent=context, annotation=annotation)
+        else:
+            method = MethodNode(node, parent=context, annotation=annotation)
+
+        name = None
+        if node.key:
+            name = node.key.name
+
+        if node.static:
+            context.add_function(name, method)
+        elif node.kind == "set" or node.kind == "get":
+            # Property
+            # See if this property already exists
+            prop = (context.properties or {}).get(name)
+
+            if not (prop and isinstance(prop, PropertyNode)):
+                # Create the property
+                prop = PropertyNode(node, writable=True, parent=context, annotation=annotation)
+            if node.kind == "set":
+                prop.add_setter(method)
             elif node.kind == "get":
-                # Property (readable)
-                # See if this property already exists as a setter
-                prop = (context.properties or {}).get(name)
-                if prop and isinstance(prop, PropertyNode):
-                    # Augment the existing property
-                    prop.readable = True
-                else:
-                    # Create the property
-                    prop = PropertyNode(node, readable=True, parent=context, annotation=annotation)
-                context.add_property(name, prop)
+                prop.add_getter(method)
+
+            context.add_property(name, prop)
+        elif node.kind == "get":
+            # Property (readable)
+            # See if this property already exists as a setter
+            prop = (context.properties or {}).get(name)
+            if prop and isinstance(prop, PropertyNode):
+                # Augment the existing property
+                prop.readable = True
             else:
-                context.add_method(name, method)
+                # Create the property
+                prop = PropertyNode(node, readable=True, parent=context, annotation=annotation)
+            context.add_property(name, prop)
+        else:
+            context.add_method(name, method)
 
-        elif node.type == "FunctionDeclaration":
-            # Determine return type for the function, if any
-            annotation = self._annotateFunction(node, text, ast, context)
-            function = FunctionNode(node, parent=context, annotation=annotation)
-            context.add_function(node.id.name, function)
+        return context
 
-        elif node.type == "BlockStatement":
-            block = Block(node, parent=context)
-            for subnode in node.body:
-                self._expand(subnode, text, ast, block)
+    @staticmethod
+    @Walker.handles('expand', 'FunctionDeclaration')
+    def _expandFunction(walk, node, context):
+        # Determine return type for the function, if any
+        annotation = walk.analyzer._annotateFunction(node, walk.text, walk.ast, context)
+        function = FunctionNode(node, parent=context, annotation=annotation)
+        context.add_function(node.id.name, function)
+        return context
+
+    @staticmethod
+    @Walker.handles('expand', 'BlockStatement')
+    def _expandBlock(walk, node, context):
+        block = BlockNode(node, parent=context)
+        for subnode in node.body:
+            yield ('expand', subnode, block)
 
         return context
 
@@ -193,100 +423,414 @@ class Analyzer:
         """ Annotates the logical aspects of the code based on the structure provided.
         """
 
-        # Go through the nodes
-        if node.type == "Program":
-            for subnode in node.body:
-                self._annotate(subnode, text, ast, context)
+        return Walker(self, text, ast).walk('annotate', node, context)
+
+    @staticmethod
+    @Walker.handles('annotate', None)
+    def _annotateOther(walk, node, context):
+        return context
+
+    @staticmethod
+    @Walker.exhausts('annotate')
+    def _annotateExhausted(walk, node, context):
+        # Out of budget: the statement is skipped
+        Analyzer._forget(walk, node, context)
+        return None
+
+    @staticmethod
+    def _forget(walk, node, context):
+        """ Notes that any variable the given (skipped) code assigns could now
+        hold anything.
+        """
+        pending = [node]
+        while pending:
+            subnode = pending.pop()
+            if isinstance(subnode, list):
+                pending.extend(subnode)
+                continue
+
+            if not isinstance(subnode, EsprimaObject):
+                continue
+
+            target = None
+            if subnode.type == 'AssignmentExpression':
+                target = subnode.left
+            elif subnode.type == 'UpdateExpression':
+                target = subnode.argument
+
+            if target is not None and target.type == 'Identifier':
+                variable = context.lookup(target.name)
+                if isinstance(variable, VariableNode):
+                    walk.analyzer._assign(variable, Value(target, 'variant').intern())
+
+            for field, value in subnode.__dict__.items():
+                if field not in CallGraph.IGNORED and isinstance(value, (list, EsprimaObject)):
+                    pending.append(value)
+
+    @staticmethod
+    @Walker.handles('annotate', 'Program')
+    def _annotateProgram(walk, node, context):
+        for subnode in node.body:
+            yield ('annotate', subnode, context)
+
+        return context
 
-        elif node.type == "VariableDeclaration":
-            # Determine the type of the variable from its initialization
-            for declaration in node.declarations:
-                # And also call the normal annotate on it
-                self._annotate(declaration, text, ast, context)
+    @staticmethod
+    @Walker.handles('annotate', 'VariableDeclaration')
+    def _annotateDeclaration(walk, node, context):
+        # Determine the type of the variable from its initialization
+        for declaration in node.declarations:
+            # And also call the normal annotate on it
+            yield ('annotate', declaration, context)
 
-        elif node.type == "VariableDeclarator":
-            # Annotate the init expression
-            annotation = self._annotateVariable(node, text, ast, context)
+        return context
 
+    @staticmethod
+    @Walker.handles('annotate', 'VariableDeclarator')
+    def _annotateDeclarator(walk, node, context):
+        # Annotate the init expression
+        annotation = walk.analyzer._annotateVariable(node, walk.text, walk.ast, context)
+
+        # Declared again (within a loop), it remains the same variable
+        variable = context.variables.get(node.id.name)
+        if variable is None or variable.node is not node:
             variable = VariableNode(node, parent=context, annotation=annotation)
             context.add_variable(node.id.name, variable)
-            if node.init:
-                # Retain the initial value of the variable
-                value = self._valueOf(node.init, text, ast, context)
-
-                # Set the value
-                variable.set_value(value)
-
-        elif node.type == "CallExpression":
-            self._valueOf(node, text, ast, context)
-
-        elif node.type == "BlockStatement":
-            block = context.find(node)
-            if block is None:
-                block = BlockNode(node, parent=context)
-            for subnode in node.body:
-                self._annotate(subnode, text, ast, block)
-
-        elif node.type == "ReturnStatement":
-            # Get the value of the inner argument
-            value = self._valueOf(node.argument, text, ast, context)
-
-            # Capture the possible return
-            if value:
-                context.add_return(value)
-
-            # Return the value of this expression
-            return value
-
-        elif node.type == "IfStatement":
-            # This is a divergence... determine the condition
-            test = self._valueOf(node.test, text, ast, context)
-
-            if test is None or test.raised():
-                # The expression could not be evaluated.
-                # Maybe it raised?
-                return None
-
-            # Dead code detection
-            if test.false():
-                # If it is always False, do not continue
-                # This is dead code
-                return None
-
-            # Add the condition while we parse the value of the
-            # if block.
-            if node.consequent:
-                context.add_condition(test)
-                self._annotate(node.consequent, text, ast, context)
-
-                # Pop the condition (tho, we worry about the else if)
-                context.pop_condition()
 
-        elif node.type == "ExpressionStatement":
-            return self._valueOf(node.expression, text, ast, context)
+        if node.init:
+            # Retain the initial value of the variable
+            value = yield ('value', node.init, context)
+
+            # Set the value
+            walk.analyzer._assign(variable, value)
+
+        return context
+
+    @staticmethod
+    @Walker.handles('annotate', 'CallExpression')
+    def _annotateCall(walk, node, context):
+        yield ('value', node, context)
+        return context
+
+    @staticmethod
+    @Walker.handles('annotate', 'BlockStatement')
+    def _annotateBlock(walk, node, context):
+        block = context.find(node)
+        if block is None:
+            block = BlockNode(node, parent=context)
+        for subnode in node.body:
+            yield ('annotate', subnode, block)
+
+        return context
+
+    @staticmethod
+    @Walker.handles('annotate', 'ReturnStatement')
+    def _annotateReturn(walk, node, context):
+        # Get the value of the inner argument
+        value = yield ('value', node.argument, context)
+
+        # Capture the possible return
+        if value:
+            context.add_return(value)
+
+        # Return the value of this expression
+        return value
+
+    @staticmethod
+    @Walker.handles('annotate', 'IfStatement')
+    def _annotateIf(walk, node, context):
+        # This is a divergence... determine the condition
+        test = yield ('value', node.test, context)
+
+        if test is None or test.raised():
+            # The expression could not be evaluated.
+            # Maybe it raised?
+            return None
+
+        # Dead code detection: a branch whose condition is always False is
+        # never walked
+        branches = []
+        if node.consequent and not test.false():
+            branches.append((test, [('annotate', node.consequent)]))
+        if node.alternate and not test.true():
+            branches.append((test.negate(), [('annotate', node.alternate)]))
+
+        if not branches:
+            return None
+
+        # Without an else, the state may also pass by untouched
+        exhaustive = node.alternate is not None or test.true()
+        yield from Analyzer._merge(walk, node, context, branches, exhaustive)
+
+        return context
+
+    @staticmethod
+    @Walker.handles('annotate', 'SwitchStatement')
+    def _annotateSwitch(walk, node, context):
+        discriminant = yield ('value', node.discriminant, context)
+
+        if discriminant is None or discriminant.raised():
+            return None
+
+        # Each case runs its statements and falls through into the next
+        # case until it reaches a break
+        branches = []
+        exhaustive = False
+        for i, case in enumerate(node.cases):
+            condition = None
+            if case.test is None:
+                # The default
+                exhaustive = True
+            else:
+                test = yield ('value', case.test, context)
+                if test is None or test.raised():
+                    continue
+
+                condition = Value.BINARY_OPERATORS['==='](discriminant, test)
+                if condition.false():
+                    continue
+
+            requests = []
+            for following in node.cases[i:]:
+                done = False
+                for statement in following.consequent:
+                    if statement.type == 'BreakStatement' and statement.label is None:
+                        done = True
+                        break
+                    requests.append(('annotate', statement,))
+
+                if done:
+                    break
+
+            branches.append((condition, requests,))
+
+            if condition is not None and condition.true():
+                # No later case is ever reached
+                exhaustive = True
+                break
+
+        yield from Analyzer._merge(walk, node, context, branches, exhaustive)
+
+        return context
+
+    @staticmethod
+    def _merge(walk, node, context, branches, exhaustive):
+        """ Walks each branch from the same state and joins the states they
+        end in.
+
+        Each branch is a condition (or None) and a list of `(phase, node)` to
+        walk under it. Every branch is walked once, starting from the state
+        before the divergence, so the cost grows with the number of branches
+        rather than with the number of paths through them. Afterward, each
+        variable any branch wrote holds the join of its value at the end of
+        every branch, plus its previous value when the branches are not
+        exhaustive.
+
+        :returns: The list of the result of the last walk of each branch.
+        """
+        analyzer = walk.analyzer
+
+        before = {}
+        states = []
+        results = []
+        for condition, requests in branches:
+            journal = analyzer._journal()
+            if condition is not None:
+                context.add_condition(condition)
+
+            result = None
+            try:
+                for phase, subnode in requests:
+                    result = yield (phase, subnode, context)
+            finally:
+                if condition is not None:
+                    context.pop_condition()
+                analyzer._close(journal)
+
+            # Note where the branch ended and rewind for the next one
+            state = {}
+            for variable, old in journal.items():
+                before.setdefault(variable, old)
+                state[variable] = variable.get_value()
+                variable.set_value(old)
+
+            states.append(state)
+            results.append(result)
+
+        if not exhaustive:
+            states.append({})
+
+        for variable, old in before.items():
+            joined = None
+            for state in states:
+                joined = Value.join(node, joined, state.get(variable, old))
+
+            analyzer._assign(variable, joined)
+
+        return results
+
+    @staticmethod
+    @Walker.handles('annotate', 'ForStatement')
+    def _annotateFor(walk, node, context):
+        if node.init:
+            if node.init.type == 'VariableDeclaration':
+                yield ('annotate', node.init, context)
+            else:
+                yield ('value', node.init, context)
+
+        return (yield from Analyzer._annotateLoop(walk, node, context, node.test, node.body, node.update))
+
+    @staticmethod
+    @Walker.handles('annotate', 'WhileStatement')
+    def _annotateWhile(walk, node, context):
+        return (yield from Analyzer._annotateLoop(walk, node, context, node.test, node.body))
+
+    @staticmethod
+    @Walker.handles('annotate', 'DoWhileStatement')
+    def _annotateDoWhile(walk, node, context):
+        # The body always runs once
+        yield ('annotate', node.body, context)
+
+        return (yield from Analyzer._annotateLoop(walk, node, context, node.test, node.body))
+
+    @staticmethod
+    def _annotateLoop(walk, node, context, test, body, update=None):
+        """ Annotates a loop by iterating until the state at its head is stable.
+
+        Each iteration joins the values variables had at the head of the loop
+        with the ones they have after its body. Past WIDEN_AFTER iterations
+        the join is widened, so growing numbers quickly reach infinity and the
+        loop converges regardless of how many times it would actually run.
+        """
+        analyzer = walk.analyzer
+
+        # Follow iterations exactly for as long as the loop surely continues
+        unrolled = 0
+        while unrolled < analyzer.unroll:
+            condition = None
+            if test is not None:
+                condition = yield ('value', test, context)
+                if condition is None or condition.raised() or condition.false():
+                    return context
+
+                if not condition.true():
+                    break
+
+            yield from Analyzer._annotateIteration(walk, context, condition, body, update)
+            unrolled += 1
+
+        # The side effects of any iteration, each performed once the loop is
+        # done (the iterations are not the runs of the loop, so their number
+        # must not be what is counted)
+        effects = {}
+
+        iteration = 0
+        while iteration < Analyzer.LOOP_LIMIT:
+            journal = analyzer._journal()
+            deferred = analyzer._defer()
+            try:
+                condition = None
+                if test is not None:
+                    condition = yield ('value', test, context)
+
+                if condition is not None and (condition.raised() or condition.false()):
+                    # The loop surely stops here
+                    break
+
+                if condition is None and test is not None:
+                    # The condition could not be evaluated
+                    break
+
+                yield from Analyzer._annotateIteration(walk, context, condition, body, update)
+            finally:
+                analyzer._release(deferred)
+                analyzer._close(journal)
+
+                for function, args in deferred:
+                    effects.setdefault((function, tuple(id(arg) for arg in args),), (function, args,))
+
+            # Join the new state with the one at the head of the loop
+            stable = True
+            for variable, before in journal.items():
+                joined = Value.join(node, before, variable.get_value())
+                if iteration >= Analyzer.WIDEN_AFTER:
+                    joined = Value.widen(node, before, joined)
+
+                if joined is not before:
+                    stable = False
+
+                analyzer._assign(variable, joined)
+
+            if stable:
+                break
+
+            iteration += 1
+
+        for function, args in effects.values():
+            analyzer._effect(function, *args)
 
         return context
 
+    @staticmethod
+    def _annotateIteration(walk, context, condition, body, update):
+        """ Annotates a single iteration of a loop body, under its condition.
+        """
+        if condition is not None:
+            context.add_condition(condition)
+
+        try:
+            yield ('annotate', body, context)
+
+            if update is not None:
+                yield ('value', update, context)
+        finally:
+            if condition is not None:
+                context.pop_condition()
+
+    @staticmethod
+    @Walker.handles('annotate', 'ExpressionStatement')
+    def _annotateExpression(walk, node, context):
+        return (yield ('value', node.expression, context))
+
     def _annotateFunction(self, node, text, ast, context):
         """ Takes a node of the given AST and attempts to annotate the function.
 
         This means it will try to determine what the return type of the function
-        might be.
+        might be along with the types of its parameters.
         """
 
         annotation = {}
 
-        # Get the comments for this function
-        for comment in ast.comments:
-            while (text[comment.range[1] + 1].isspace()):
-                comment.range[1] += 1
-            if comment.range[1] == node.range[0] - 1:
-                doc = self.parseDocstring(comment.value)
-                if 'returns' in doc:
-                    annotation['returns'] = doc['returns']['type']
+        # Get the comment directly preceding this function
+        comment = self._commentIndex(ast, text).get(node.range[0])
+        if comment is not None:
+            doc = DocString.parse(comment.value)
+            annotation['docstring'] = doc
+            if doc.returns is not None:
+                annotation['returns'] = doc.returns['type']
+            if doc.params:
+                annotation['params'] = {param['name']: param['type'] for param in doc.params}
 
         return annotation
 
+    def _commentIndex(self, ast, text):
+        """ Returns the comments of the given AST keyed by the offset of the
+        code that directly follows each of them.
+
+        The index is built once per AST, so finding the docstring of a
+        declaration is a single lookup.
+        """
+
+        entry = self.comment_indices.get(id(ast))
+        if entry is not None and entry[0] is ast:
+            return entry[1]
+
+        index = index_comments(ast, text)
+
+        # Keep the AST alongside so its id cannot be reused while cached
+        self.comment_indices[id(ast)] = (ast, index,)
+        return index
+
     def _annotateVariable(self, node, text, ast, context):
         ret = {}
 
@@ -309,6 +853,12 @@ class Analyzer:
             if info and info.annotation.get('returns'):
                 return info.annotation['returns']
 
+        elif node.type == "Identifier":
+            # Variables (and documented parameters) carry their type
+            info = context.lookup(node.name)
+            if info and info.annotation.get('type'):
+                return info.annotation['type']
+
         return None
 
     def _valueOf(self, node, text, ast, context):
@@ -320,22 +870,11 @@ class Analyzer:
         return Value.valueOf(node, text, self, context)
 
     def _parse(self):
-        if self.precodeast is None:
-            code = ""
-            for precode in self.precode:
-                code += precode
-            self.precodetext = code
-            self.precodeast = parseScript(code, {
-                'range': True, 'tolerant': True, 'comment': True, 'loc': True
-            })
-
         if self.ast is not None:
             return self.ast
 
         code = self.code
-        self.ast = parseScript(code, {
-            'range': True, 'tolerant': True, 'comment': True, 'loc': True
-        })
+        self.ast = parseScript(code, Analyzer.PARSE_OPTIONS)
         self.text = code
 
         return self.ast
@@ -0,0 +1,128 @@
+# vim: ts=4:sw=4
+import os
+import time
+
+from lib.values.value import Value
+
+
+class Budget:
+    """ Limits how much work a single analysis may do.
+
+    The analysis spends a step on every node it evaluates, enters a frame for
+    every call it follows and caps the possibilities of every Value it stores.
+    Running out of steps (or past the deadline) stops the analysis of whatever
+    is left: every node from then on evaluates to a 'variant'. Calls nested
+    too deeply and Values with too many possibilities are degraded the same
+    way, but only where they happen. Either way the analysis still finishes,
+    and it is then only `partial`.
+
+    Each limit may be None, for no limit at all. The defaults are read from
+    the environment.
+    """
+
+    # Nodes evaluated per analysis
+    STEPS = int(os.getenv('PYVALIDATE_MAX_STEPS', 2000000))
+
+    # Calls being followed at once
+    DEPTH = int(os.getenv('PYVALIDATE_MAX_DEPTH', 128))
+
+    # Possibilities of any stored Value
+    VALUES = int(os.getenv('PYVALIDATE_MAX_VALUES', 256))
+
+    # Seconds per analysis
+    DEADLINE = float(os.getenv('PYVALIDATE_DEADLINE', 5))
+
+    # Steps between looks at the clock
+    CLOCK_EVERY = 1024
+
+    def __init__(self, steps=STEPS, depth=DEPTH, values=VALUES, deadline=DEADLINE):
+        self.steps = steps
+        self.depth = depth
+        self.values = values
+        self.deadline = deadline
+        self.start()
+
+    def start(self):
+        """ Resets what was spent, for a new analysis.
+        """
+        self.spent = 0
+        self.frames = 0
+        self.started = time.monotonic()
+
+        # Whether the analysis stopped, and the limits it reached
+        self.exhausted = False
+        self.exceeded = set()
+
+    def limits(self):
+        """ Returns the limits that determine the result of an analysis (the
+        deadline only cuts it short when the machine is slow).
+        """
+        return (self.steps, self.depth, self.values,)
+
+    @property
+    def partial(self):
+        """ Whether any part of the analysis was cut short.
+        """
+        return bool(self.exceeded)
+
+    def exceed(self, limit):
+        """ Notes that the given limit was reached.
+        """
+        self.exceeded.add(limit)
+        return False
+
+    def spend(self):
+        """ Spends a step, returning False once the analysis is out of budget.
+        """
+        if self.exhausted:
+            return False
+
+        self.spent += 1
+        if self.steps is not None and self.spent > self.steps:
+            self.exhausted = True
+            return self.exceed('steps')
+
+        if self.deadline is not None and self.spent % Budget.CLOCK_EVERY == 0:
+            if time.monotonic() - self.started > self.deadline:
+                self.exhausted = True
+                return self.exceed('deadline')
+
+        return True
+
+    def enter(self):
+        """ Enters a call, returning False when it should not be followed.
+        """
+        if self.exhausted:
+            return False
+
+        if self.depth is not None and self.frames >= self.depth:
+            return self.exceed('depth')
+
+        self.frames += 1
+        return True
+
+    def leave(self):
+        """ Leaves a call that was entered.
+        """
+        self.frames -= 1
+
+    def cap(self, value):
+        """ Returns the given Value with at most `values` possibilities.
+
+        Numbers are merged into ranges first. A Value that is still too large
+        (such as one referring to too many objects) becomes a 'variant'.
+        """
+        if value is None or self.values is None or len(value.values) <= self.values:
+            return value
+
+        self.exceed('values')
+
+        ret = Value(value.node)
+        for value_item in value.values:
+            ret.add(*value_item)
+        ret.bound(self.values)
+
+        if len(ret.values) > self.values:
+            return Value(value.node, 'variant').intern()
+
+        return ret.intern()
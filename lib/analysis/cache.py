@@ -0,0 +1,143 @@
+# vim: ts=4:sw=4
+import hashlib
+import json
+import os
+import tempfile
+
+from lib.analysis.prelude import CACHE_DIR
+
+
+class ResultCache:
+    """ A content-addressed, on-disk cache of analysis results.
+
+    Results are stored as JSON files named by a digest of everything that
+    determines them: the code, the prelude and the version of the analyzer.
+    Any number of processes may share the same directory. Files are written
+    atomically and the least recently used ones are removed once the cache
+    grows past `max_bytes`.
+    """
+
+    # Default size bound of the cache
+    MAX_BYTES = int(os.getenv('PYVALIDATE_CACHE_SIZE', 256 * 1024 * 1024))
+
+    # Eviction removes entries until the cache is down to this fraction
+    LOW_WATER = 0.9
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.path.join(CACHE_DIR, 'results')
+        self.max_bytes = ResultCache.MAX_BYTES if max_bytes is None else max_bytes
+
+        # Our estimate of the size of the cache, measured on first write
+        self.size = None
+
+    @staticmethod
+    def key(*parts):
+        """ Returns the digest of the given strings, used to address a result.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            data = str(part).encode('utf-8')
+            digest.update(f'{len(data)}\n'.encode('utf-8'))
+            digest.update(data)
+
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def get(self, key):
+        """ Returns the result stored under the given key, or None.
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'r') as f:
+                ret = json.load(f)
+        except (OSError, ValueError):
+            # Missing, evicted or corrupt
+            return None
+
+        # Note the use for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return ret
+
+    def put(self, key, value):
+        """ Stores the given JSON-serializable result under the given key.
+        """
+        path = self.path(key)
+        data = json.dumps(value).encode('utf-8')
+
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.result-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            # Caching is only an optimization
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+            return
+
+        if self.size is None:
+            self.size = self._measure()
+        else:
+            self.size += len(data)
+
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """ Removes the least recently used results until the cache fits.
+        """
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path,))
+
+        # Others might have written (or evicted) since our last look
+        self.size = sum(size for _, size, _ in entries)
+
+        entries.sort()
+        for _, size, path in entries:
+            if self.size <= self.max_bytes * ResultCache.LOW_WATER:
+                break
+
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            self.size -= size
+
+    def _measure(self):
+        ret = 0
+        for entry in self._entries():
+            try:
+                ret += entry.stat().st_size
+            except OSError:
+                pass
+
+        return ret
+
+    def _entries(self):
+        try:
+            shards = list(os.scandir(self.directory))
+        except OSError:
+            return
+
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.json'):
+                        yield entry
+            except OSError:
+                continue
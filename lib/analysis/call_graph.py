@@ -0,0 +1,306 @@
+# vim: ts=4:sw=4
+from esprima.objects import Object as EsprimaObject
+
+# Structural Nodes
+from lib.nodes.class_node import ClassNode
+from lib.nodes.function_node import FunctionNode
+
+
+class CallGraph:
+    """ Which functions (and methods) of an expanded program may call which.
+
+    Functions are identified by their definition in the AST, which every copy
+    of their structural node shares. Calls are found syntactically within each
+    definition and resolved conservatively: a method called on an object of
+    unknown class may be any method of that name.
+
+    The functions are then grouped into strongly connected components, which
+    are listed callees first. A function is recursive when its component has
+    a cycle, that is when it may eventually call itself.
+    """
+
+    # AST fields that never hold code
+    IGNORED = frozenset([
+        'range', 'loc', 'raw', 'comments', 'errors', 'tokens',
+        'leadingComments', 'trailingComments', 'innerComments',
+    ])
+
+    def __init__(self, context, base=None):
+        """ Builds the call graph of every function within the given context.
+
+        When given the CallGraph of a `base` context the given one extends
+        (such as the prelude), only the functions that context adds are
+        looked at. What the base found is reused as it is.
+        """
+        # Functions by definition and methods by name
+        self.functions = {}
+        self.methods = {}
+
+        # The definitions each definition may call
+        self.edges = {}
+
+        # Components (tuples of definitions), callees first, and the index of
+        # the component of each definition
+        self.components = []
+        self.component = {}
+
+        # The indices of the components that have a cycle
+        self.cycles = set()
+
+        # The names of the methods each definition calls on objects of
+        # unknown class (which any later method of that name may answer)
+        self.unknown = {}
+
+        if base is not None:
+            self._extend(base)
+
+        added = self._collect(context)
+        for definition in added:
+            self.edges[definition] = self._calls(self.functions[definition])
+
+        if self._reconnect(base, added):
+            # Calls from the base now reach the new functions, so components
+            # of the base may grow: find them all again
+            self.components = []
+            self.component = {}
+            self.cycles = set()
+            self._connect(self.functions)
+        else:
+            self._connect(added)
+
+    def recursive(self, function):
+        """ Determines if the given function may call itself.
+        """
+        return self.componentOf(function) is not None
+
+    def componentOf(self, function):
+        """ Returns the index of the component of the given function when it is
+        recursive, and None otherwise.
+        """
+        index = self.component.get(function.node)
+        if index in self.cycles:
+            return index
+
+        return None
+
+    def _extend(self, base):
+        """ Starts out with a copy of everything the given CallGraph found.
+        """
+        self.functions = dict(base.functions)
+        self.methods = {name: list(definitions) for name, definitions in base.methods.items()}
+        self.edges = {definition: list(callees) for definition, callees in base.edges.items()}
+        self.components = list(base.components)
+        self.component = dict(base.component)
+        self.cycles = set(base.cycles)
+        self.unknown = {definition: set(names) for definition, names in base.unknown.items()}
+
+    def _collect(self, context):
+        """ Finds every function and method held within the given context
+        that is not already known.
+
+        :returns: The list of the definitions of the functions found.
+        """
+        ret = []
+
+        seen = set()
+        pending = [context]
+        while pending:
+            node = pending.pop()
+            if node is None or id(node) in seen:
+                continue
+            seen.add(id(node))
+
+            if node is not context and isinstance(node, (FunctionNode, ClassNode,)) and self._known(node):
+                # Part of the base, along with everything within it
+                continue
+
+            if isinstance(node, FunctionNode):
+                self.functions[node.node] = node
+                ret.append(node.node)
+
+            if isinstance(node, ClassNode):
+                for name, method in node.methods.items():
+                    self.methods.setdefault(name, []).append(method.node)
+
+            pending.extend(node.members())
+
+        return ret
+
+    def _known(self, node):
+        """ Determines if the given function or class was found by the base.
+        """
+        if isinstance(node, FunctionNode):
+            return node.node in self.functions
+
+        return any(method.node in self.functions for method in node.methods.values())
+
+    def _reconnect(self, base, added):
+        """ Adds the calls the functions of the base make to the new methods.
+
+        :returns: True if there were any.
+        """
+        if base is None:
+            return False
+
+        ret = False
+        for definition, names in base.unknown.items():
+            for name in names:
+                for callee in self.methods.get(name, []):
+                    if callee in base.functions or callee in self.edges[definition]:
+                        continue
+
+                    self.edges[definition].append(callee)
+                    ret = True
+
+        return ret
+
+    def _calls(self, function):
+        """ Returns the definitions the given function may call.
+        """
+        ret = []
+
+        pending = [function.node]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, list):
+                pending.extend(node)
+                continue
+
+            if not isinstance(node, EsprimaObject):
+                continue
+
+            if node.type in ['CallExpression', 'NewExpression']:
+                for callee in self._resolve(function, node.callee):
+                    if callee in self.functions and callee not in ret:
+                        ret.append(callee)
+
+            for field, value in node.__dict__.items():
+                if field not in CallGraph.IGNORED and isinstance(value, (list, EsprimaObject)):
+                    pending.append(value)
+
+        return ret
+
+    def _resolve(self, function, callee):
+        """ Returns the definitions the given callee expression may refer to.
+        """
+        if callee.type == 'Identifier':
+            item = CallGraph._lookup(function, callee.name)
+            if isinstance(item, ClassNode):
+                # Calling a class runs its constructor
+                item = item.methods.get('constructor')
+
+            if isinstance(item, FunctionNode):
+                return [item.node]
+
+            return []
+
+        if callee.type != 'MemberExpression' or callee.computed:
+            return []
+
+        name = callee.property.name
+        if callee.object.type == 'ThisExpression':
+            # A method of the class the function belongs to
+            klass = function.parent
+            while klass is not None and not isinstance(klass, ClassNode):
+                klass = klass.parent
+
+            if klass is not None:
+                item = klass.methods.get(name)
+                if item is None:
+                    item = klass.functions.get(name)
+                if item is not None:
+                    return [item.node]
+        elif callee.object.type == 'Identifier':
+            item = CallGraph._lookup(function, callee.object.name)
+            if isinstance(item, ClassNode):
+                # A static method
+                item = item.functions.get(name)
+                return [] if item is None else [item.node]
+
+        # An object of unknown class
+        self.unknown.setdefault(function.node, set()).add(name)
+        return self.methods.get(name, [])
+
+    @staticmethod
+    def _lookup(context, name):
+        """ Looks up the given name from the given context without copying
+        anything into the overlay of the analysis.
+        """
+        while context is not None:
+            for container in ['variables', 'functions', 'classes']:
+                item = getattr(context, container, None)
+                if item and name in item:
+                    return item[name]
+
+            context = context.parent
+
+        return None
+
+    def _connect(self, roots):
+        """ Finds the strongly connected components (Tarjan's algorithm) of
+        the given definitions and whatever they call.
+
+        Definitions already in a component are left as they are: nothing
+        they call can call back into the new ones. The depth-first search
+        keeps its own stack, so long call chains do not run out of
+        interpreter stack.
+        """
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+
+        for root in roots:
+            if root in index or root in self.component:
+                continue
+
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.edges[root]),)]
+
+            while work:
+                definition, callees = work[-1]
+
+                for callee in callees:
+                    if callee in self.component and callee not in index:
+                        # Within a component found before
+                        continue
+
+                    if callee not in index:
+                        # Visit the callee before going on with our calls
+                        index[callee] = low[callee] = len(index)
+                        stack.append(callee)
+                        on_stack.add(callee)
+                        work.append((callee, iter(self.edges[callee]),))
+                        break
+
+                    if callee in on_stack:
+                        low[definition] = min(low[definition], index[callee])
+                else:
+                    work.pop()
+                    if work:
+                        caller = work[-1][0]
+                        low[caller] = min(low[caller], low[definition])
+
+                    if low[definition] == index[definition]:
+                        self._close(definition, stack, on_stack)
+
+    def _close(self, definition, stack, on_stack):
+        """ Pops the component rooted at the given definition off the stack.
+        """
+        component = []
+        while True:
+            member = stack.pop()
+            on_stack.discard(member)
+            component.append(member)
+            if member is definition:
+                break
+
+        number = len(self.components)
+        self.components.append(tuple(component))
+        for member in component:
+            self.component[member] = number
+
+        if len(component) > 1 or definition in self.edges[definition]:
+            self.cycles.add(number)
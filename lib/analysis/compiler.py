@@ -0,0 +1,162 @@
+# vim: ts=4:sw=4
+import weakref
+
+
+class Compiler:
+    """ Compiles expressions into trees of closures.
+
+    The first time an expression is evaluated, it is turned into a closure
+    `fn(walk, context)` that computes its Value. Operators and names are bound
+    when compiling, so evaluating it again involves no dispatch on node types.
+
+    Only expressions that never call into a function body (or assign) are
+    compiled, as are only those shallow enough to evaluate with Python
+    recursion (see MAX_DEPTH). Everything else is left to the Walker.
+    """
+
+    # Compiled expressions by node (False for those that cannot be compiled)
+    COMPILED = weakref.WeakKeyDictionary()
+
+    # How deeply nested a compiled expression may be
+    MAX_DEPTH = 64
+
+    # Compiles each node type, by node type
+    BUILDERS = {}
+
+    @staticmethod
+    def builds(*types):
+        """ Registers the decorated function as the builder for the given types.
+        """
+        def register(builder):
+            for type in types:
+                Compiler.BUILDERS[type] = builder
+            return builder
+
+        return register
+
+    @staticmethod
+    def compiled(node):
+        """ Returns the closure evaluating the given expression, or None.
+        """
+        ret = Compiler.COMPILED.get(node)
+        if ret is None:
+            ret = Compiler.compile(node) or False
+            Compiler.COMPILED[node] = ret
+
+        return ret or None
+
+    @staticmethod
+    def compile(node, depth=0):
+        """ Builds the closure evaluating the given expression, or returns None
+        if it cannot be compiled.
+        """
+        if depth > Compiler.MAX_DEPTH:
+            return None
+
+        builder = Compiler.BUILDERS.get(node.type)
+        if builder is None:
+            return None
+
+        return builder(node, depth)
+
+
+@Compiler.builds('Literal')
+def _compileLiteral(node, depth):
+    from lib.values.value import Value
+
+    kind = None
+    if isinstance(node.value, int):
+        kind = 'int'
+    elif isinstance(node.value, float):
+        kind = 'float'
+    elif isinstance(node.value, str):
+        kind = 'string'
+
+    if kind is None:
+        return lambda walk, context: None
+
+    # The Value only depends on the condition, which rarely changes
+    last = [None, None]
+
+    def literal(walk, context):
+        condition = context.condition
+        if last[1] is None or last[0] is not condition:
+            last[0] = condition
+            last[1] = Value(node, kind, node.value, condition).intern()
+
+        return last[1]
+
+    return literal
+
+
+@Compiler.builds('Identifier')
+def _compileIdentifier(node, depth):
+    name = node.name
+
+    def identifier(walk, context):
+        variable = context.lookup(name)
+        if variable is None:
+            return None
+        walk.analyzer._load(variable)
+        return variable.get_value()
+
+    return identifier
+
+
+@Compiler.builds('MemberExpression')
+def _compileMember(node, depth):
+    if node.computed or node.object.type != 'Identifier':
+        return None
+
+    name = node.object.name
+    property_name = node.property.name
+
+    def member(walk, context):
+        prop = context.lookup(name).lookup(property_name)
+        walk.analyzer._load(prop)
+        return prop.get_value()
+
+    return member
+
+
+@Compiler.builds('UnaryExpression')
+def _compileUnary(node, depth):
+    from lib.values.value import Value
+
+    operation = Value.UNARY_OPERATORS.get(node.operator)
+    if operation is None:
+        return lambda walk, context: None
+
+    argument = Compiler.compile(node.argument, depth + 1)
+    if argument is None:
+        return None
+
+    return lambda walk, context: operation(argument(walk, context))
+
+
+@Compiler.builds('BinaryExpression')
+def _compileBinary(node, depth):
+    from lib.values.value import Value
+
+    operation = Value.BINARY_OPERATORS.get(node.operator)
+    if operation is None:
+        return None
+
+    left = Compiler.compile(node.left, depth + 1)
+    if left is None:
+        return None
+
+    right = Compiler.compile(node.right, depth + 1)
+    if right is None:
+        return None
+
+    def binary(walk, context):
+        lhs = left(walk, context)
+        rhs = right(walk, context)
+        if lhs is None or rhs is None:
+            # Nothing is known of an operand, so nothing of the result
+            return None
+
+        return operation(lhs, rhs)
+
+    return binary
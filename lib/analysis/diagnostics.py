@@ -0,0 +1,93 @@
+# vim: ts=4:sw=4
+from lib.nodes.function_node import FunctionNode
+from lib.values.raised import Raised
+
+
+class Diagnostics:
+    """ Every exception an analysis found might be raised, in one table.
+
+    Each raise is recorded once, within the scope (structural node) it
+    happened in, and identical raises (the same exception and message, at the
+    same place, on the same condition) are only recorded the first time. Scopes
+    are told apart by the code that defines them, so loops and calls that
+    evaluate the same code again (even within a new copy of its scope) do not
+    add to the table. How many times each raise happens is counted separately,
+    as its `occurrences` (see occur()).
+
+    What a scope has raised is its own raises and those of the scopes within
+    it, up to the functions within it, which keep theirs. That view is only
+    computed when asked for.
+    """
+
+    def __init__(self):
+        # Raises by (scope, exception, message, location, condition)
+        self.entries = {}
+
+        # The scopes raises were recorded in, by their definition, with their
+        # raises
+        self.scopes = {}
+
+        # Computed views, by scope (which they keep alive, so a scope is
+        # never mistaken for another)
+        self.views = {}
+
+    def record(self, scope, node, exception, message, condition):
+        """ Records that the given node raises within the given scope, and
+        returns the Raised standing for it.
+        """
+        location = None if node is None else tuple(node.range)
+        key = (scope.node, exception, message, location, condition,)
+        ret = self.entries.get(key)
+        if ret is not None:
+            return ret
+
+        ret = Raised(exception, message, condition)
+        self.entries[key] = ret
+        self.scopes.setdefault(scope.node, (scope, [],))[1].append(ret)
+        self.views = {}
+
+        return ret
+
+    @staticmethod
+    def occur(raised):
+        """ Counts an occurrence of the given raise.
+
+        This is a side effect of the analysis (see Analyzer._effect), so a
+        raise within a loop occurs once per loop and one within a function
+        once per call.
+        """
+        raised.occurrences += 1
+
+    def raised(self, scope):
+        """ Returns the exceptions raised within the given scope: lists of
+        distinct Raised by exception.
+        """
+        ret = self.views.get(scope)
+        if ret is not None:
+            return ret
+
+        ret = {}
+        for origin, raises in self.scopes.values():
+            if Diagnostics._within(origin, scope):
+                for raised in raises:
+                    ret.setdefault(raised.exception, []).append(raised)
+
+        self.views[scope] = ret
+        return ret
+
+    @staticmethod
+    def _within(origin, scope):
+        """ Determines if raises within `origin` are seen by `scope`.
+        """
+        node = origin
+        while node is not None:
+            if node is scope:
+                return True
+
+            # Functions keep what they raise to themselves
+            if isinstance(node, FunctionNode):
+                return False
+
+            node = node.parent
+
+        return False
@@ -1,4 +1,122 @@
 # vim: ts=4:sw=4
+import re
+
+from functools import lru_cache
+
+
 class DocString:
     """ Represents a documentation string for JavaScript.
+
+    This is the parsed signature of a JSDoc block: its description, typed
+    parameters, return type and any other tags. Parsed DocStrings are shared
+    between every declaration with the same comment and must not be modified.
     """
+
+    # Matches a tag line: @<token> {<type>} <name or description>
+    TAG_RE = re.compile(r'@(?P<token>[a-zA-Z]+)(?:\s+{(?P<type>[^}]*)})?(?:\s+(?P<rest>.*))?')
+
+    # Matches the name of a parameter (optionally [bracketed=default]) and
+    # the rest of the line as its description.
+    PARAM_RE = re.compile(r'(?P<name>\[[^\]]*\]|[^\s]+)(?:\s+(?:-\s+)?(?P<description>.*))?')
+
+    # Aliases of tags we understand
+    ALIASES = {
+        'return': 'returns',
+        'arg': 'param',
+        'argument': 'param',
+    }
+
+    def __init__(self):
+        self.description = None
+        self.params = []
+        self.returns = None
+        self.type = None
+        self.tags = {}
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def parse(comment: str):
+        """ Parses the given block comment into a DocString.
+
+        Results are memoized by the comment text.
+
+        :param comment: The block comment string which may include asterisks.
+        :returns: The parsed signature.
+        :rtype: DocString
+        """
+
+        ret = DocString()
+
+        description = []
+        current = None
+        for line in comment.split('\n'):
+            # Remove the decoration common to JSDoc blocks
+            line = line.strip().lstrip('*').strip()
+
+            match = DocString.TAG_RE.match(line)
+            if match is None:
+                # A continuation of the last tag or of the description
+                if line:
+                    if current is None:
+                        description.append(line)
+                    else:
+                        current['description'] = ' '.join(filter(None, [current['description'], line]))
+                continue
+
+            token = DocString.ALIASES.get(match['token'], match['token'])
+            rest = match['rest'] or None
+            current = {
+                'type': match['type'],
+                'description': rest,
+            }
+
+            if token == 'param':
+                current['name'] = None
+                current['optional'] = False
+                if rest:
+                    param = DocString.PARAM_RE.match(rest)
+                    name = param['name']
+                    if name.startswith('['):
+                        current['optional'] = True
+                        name = name[1:-1].split('=')[0]
+                    current['name'] = name.strip()
+                    current['description'] = param['description']
+                ret.params.append(current)
+            elif token == 'returns':
+                ret.returns = current
+            elif token == 'type':
+                ret.type = match['type']
+            else:
+                ret.tags[token] = ret.tags.get(token, [])
+                ret.tags[token].append(current)
+
+        if description:
+            ret.description = ' '.join(description)
+
+        return ret
+
+    def param(self, name):
+        """ Returns the documentation for the parameter with the given name.
+        """
+        for param in self.params:
+            if param['name'] == name:
+                return param
+
+        return None
+
+    def to_dict(self):
+        """ Returns the fields of this DocString as a dict.
+        """
+        ret = {}
+
+        if self.description is not None:
+            ret['description'] = self.description
+        if self.params:
+            ret['params'] = self.params
+        if self.returns is not None:
+            ret['returns'] = self.returns
+        if self.type is not None:
+            ret['type'] = self.type
+        ret.update(self.tags)
+
+        return ret
@@ -0,0 +1,187 @@
+# vim: ts=4:sw=4
+import hashlib
+
+from collections import ChainMap
+
+from esprima import parseScript
+from esprima.objects import Object as EsprimaObject
+
+from lib.analysis.doc_string import DocString
+from lib.analysis.parsing import PARSE_OPTIONS, index_comments
+
+
+class Fingerprint:
+    """ A digest of the structure of a program.
+
+    Two programs share a fingerprint when they only differ in whitespace,
+    comments, the raw spelling of literals or the names of function-local
+    variables and parameters. Those differences cannot change the result of an
+    analysis, so results may be shared between them.
+
+    The types documented for a declaration are kept since the analysis reads
+    them. Global names are kept since rubrics (and other programs) refer to
+    them.
+    """
+
+    # AST fields that do not affect the meaning of a program
+    IGNORED = frozenset([
+        'range', 'loc', 'raw', 'comments', 'errors', 'tokens',
+        'leadingComments', 'trailingComments', 'innerComments',
+    ])
+
+    # Fields holding names which are not variable references, when the
+    # node they belong to is not `computed`
+    PROPERTIES = {
+        'MemberExpression': 'property',
+        'Property': 'key',
+        'MethodDefinition': 'key',
+    }
+
+    # Fields holding labels (which are never variables)
+    LABELS = {
+        'LabeledStatement': 'label',
+        'BreakStatement': 'label',
+        'ContinueStatement': 'label',
+    }
+
+    # Nodes the analysis reads documented types for
+    DOCUMENTED = frozenset([
+        'FunctionDeclaration', 'MethodDefinition',
+    ])
+
+    # Nodes introducing a function scope
+    FUNCTIONS = frozenset([
+        'FunctionDeclaration', 'FunctionExpression', 'ArrowFunctionExpression',
+    ])
+
+    def __init__(self, code):
+        """ Parses the given code and computes its fingerprint.
+        """
+        ast = parseScript(code, PARSE_OPTIONS)
+        self.comments = index_comments(ast, code)
+
+        # Functions entered so far, which number their renamed locals
+        self.depth = 0
+
+        normalized = self._normalize(ast, ChainMap())
+        self.digest = hashlib.sha256(repr(normalized).encode('utf-8')).hexdigest()
+
+    def _normalize(self, node, scope):
+        """ Returns the given AST as nested tuples with locals renamed.
+        """
+        if isinstance(node, list):
+            return tuple(self._normalize(item, scope) for item in node)
+
+        if not isinstance(node, EsprimaObject):
+            return node
+
+        if node.type == 'Identifier':
+            return ('Identifier', scope.get(node.name, node.name),)
+
+        if node.type in Fingerprint.FUNCTIONS:
+            scope = self._enter(node, scope)
+
+        ret = [node.type]
+
+        # The types documented for it, with its parameters renamed
+        comment = None
+        if node.type in Fingerprint.DOCUMENTED:
+            comment = self.comments.get(node.range[0])
+        doc = None if comment is None else DocString.parse(comment.value)
+        if doc is not None and (doc.returns is not None or doc.params):
+            ret.append(('doc', None if doc.returns is None else doc.returns['type'], tuple(
+                (scope.get(param['name'], param['name']), param['type'],) for param in doc.params
+            ),))
+
+        skip = None
+        if not getattr(node, 'computed', False):
+            skip = Fingerprint.PROPERTIES.get(node.type)
+        label = Fingerprint.LABELS.get(node.type)
+
+        for field, value in sorted(node.__dict__.items()):
+            if field in Fingerprint.IGNORED or field == 'type':
+                continue
+
+            if (field == skip or field == label) and isinstance(value, EsprimaObject):
+                # A name, but not a variable
+                ret.append((field, ('Name', value.name,),))
+            elif node.type == 'FunctionDeclaration' and field == 'id':
+                # Declared within the enclosing scope (which has renamed it
+                # already, if it is local there)
+                ret.append((field, self._normalize(value, scope.parents),))
+            else:
+                ret.append((field, self._normalize(value, scope),))
+
+        return tuple(ret)
+
+    def _enter(self, function, scope):
+        """ Returns the scope of the body of the given function.
+
+        Only bindings of the whole function are renamed: its parameters, its
+        `var` declarations and what is declared directly in its body. Names
+        bound by nested blocks (`let`, `const`, classes, functions and caught
+        exceptions) are left alone, so a block binding never gets the same
+        name as a global it might otherwise be confused with.
+        """
+        self.depth += 1
+        names = {}
+
+        def bind(pattern):
+            if pattern is None:
+                return
+
+            if pattern.type == 'Identifier':
+                if pattern.name not in names:
+                    names[pattern.name] = f'#{self.depth}.{len(names)}'
+            elif pattern.type == 'AssignmentPattern':
+                bind(pattern.left)
+            elif pattern.type == 'RestElement':
+                bind(pattern.argument)
+            elif pattern.type == 'ArrayPattern':
+                for element in pattern.elements:
+                    bind(element)
+            elif pattern.type == 'ObjectPattern':
+                for prop in pattern.properties:
+                    bind(prop.value if prop.type == 'Property' else prop)
+
+        if function.type == 'FunctionExpression':
+            bind(function.id)
+
+        for param in function.params:
+            bind(param)
+
+        # Declarations directly within the body
+        statements = []
+        if function.body.type == 'BlockStatement':
+            statements = function.body.body
+
+        for statement in statements:
+            if statement.type == 'VariableDeclaration':
+                for declarator in statement.declarations:
+                    bind(declarator.id)
+            elif statement.type in ['FunctionDeclaration', 'ClassDeclaration']:
+                bind(statement.id)
+
+        # 'var' declarations anywhere in the body, short of nested functions
+        pending = [function.body]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, list):
+                pending.extend(reversed(node))
+                continue
+
+            if not isinstance(node, EsprimaObject):
+                continue
+
+            if node.type == 'VariableDeclaration' and node.kind == 'var':
+                for declarator in node.declarations:
+                    bind(declarator.id)
+
+            if node.type in Fingerprint.FUNCTIONS:
+                continue
+
+            for field, value in node.__dict__.items():
+                if field not in Fingerprint.IGNORED and isinstance(value, (list, EsprimaObject)):
+                    pending.append(value)
+
+        return scope.new_child(names)
@@ -0,0 +1,86 @@
+# vim: ts=4:sw=4
+import operator
+
+# Structural Nodes
+from lib.nodes.class_node import ClassNode
+from lib.nodes.function_node import FunctionNode
+
+
+class Grader:
+    """ Checks an annotated program against a rubric.
+
+    A rubric is a list of checks, each of the form:
+
+        {"name": "createSprite", "op": ">=", "value": 2}
+
+    The name is looked up within the program: a function counts how many
+    times it is called and a class how many times it is constructed. The
+    check passes when that count compares to the value by the operator.
+    """
+
+    # The comparisons a check may use
+    OPERATORS = {
+        '==': operator.eq,
+        '!=': operator.ne,
+        '<': operator.lt,
+        '<=': operator.le,
+        '>': operator.gt,
+        '>=': operator.ge,
+    }
+
+    def __init__(self, rubric):
+        """ Constructs a grader for the given list of checks.
+        """
+        self.rubric = list(rubric or [])
+
+        for check in self.rubric:
+            if check.get('op', '>=') not in Grader.OPERATORS:
+                raise ValueError(f"unknown operator in check: {check.get('op')}")
+
+    @staticmethod
+    def count(context, name):
+        """ Returns how many times the named function or class is used.
+        """
+        item = context.lookup(name)
+        if isinstance(item, FunctionNode):
+            return item.called
+        elif isinstance(item, ClassNode):
+            return item.instanced
+
+        return 0
+
+    @staticmethod
+    def counts(context):
+        """ Returns the count of every name declared by the given context.
+
+        Anything a rubric may check is in here, so the counts can stand in for
+        the (much larger) context once the analysis is done.
+        """
+        ret = {}
+        for container in [context.variables, context.functions, context.classes]:
+            for name in container:
+                if name not in ret:
+                    ret[name] = Grader.count(context, name)
+
+        return ret
+
+    def grade(self, counts):
+        """ Runs every check against the given counts (see counts()).
+
+        :returns: The list of checks, each with its `actual` count and whether
+                  it `passed`.
+        """
+        ret = []
+
+        for check in self.rubric:
+            op = check.get('op', '>=')
+            actual = counts.get(check['name'], 0)
+            ret.append({
+                'name': check['name'],
+                'op': op,
+                'value': check.get('value', 1),
+                'actual': actual,
+                'passed': Grader.OPERATORS[op](actual, check.get('value', 1)),
+            })
+
+        return ret
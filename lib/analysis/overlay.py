@@ -0,0 +1,47 @@
+# vim: ts=4:sw=4
+
+
+class Overlay:
+    """ The per-analysis, copy-on-write layer over a frozen (shared) context.
+
+    Any number of analyses may share one expanded prelude. The first time an
+    analysis looks up a frozen node, the node is forked into this overlay and
+    every further change (call counts, instantiations, raises, ...) is made to
+    that private copy.
+    """
+
+    def __init__(self, base):
+        """ Creates the overlay for the given frozen root context.
+        """
+        self.base = base
+        self.forks = {}
+        self.root = self.thaw(base)
+
+        # The base may itself extend a shared context (a prelude plus some
+        # pre-code). Nodes of that context see our root as their root.
+        origin = base.origin
+        while origin is not None:
+            self.forks[id(origin)] = self.root
+            origin = origin.origin
+
+    def thaw(self, node):
+        """ Returns the private copy of the given node, forking it if necessary.
+        """
+        if node is None or not node.frozen:
+            return node
+
+        ret = self.forks.get(id(node))
+        if ret is not None:
+            return ret
+
+        ret = node.fork()
+        ret.overlay = self
+        self.forks[id(node)] = ret
+
+        # Rewire the copy to live under our copy of its parent
+        parent = self.thaw(node.parent)
+        ret.parent = parent
+        if parent is not None:
+            parent.adopt(node, ret)
+
+        return ret
@@ -0,0 +1,24 @@
+# vim: ts=4:sw=4
+""" Parsing helpers shared by everything that reads JavaScript source.
+"""
+
+
+# Options passed along to esprima for every parse.
+PARSE_OPTIONS = {
+    'range': True, 'tolerant': True, 'comment': True, 'loc': True
+}
+
+
+def index_comments(ast, text):
+    """ Returns the comments of the given AST keyed by the offset of the code
+    that directly follows each of them.
+    """
+    ret = {}
+    for comment in (ast.comments or []):
+        # Skip the whitespace between the comment and what follows it
+        end = comment.range[1] + 1
+        while end < len(text) and text[end].isspace():
+            end += 1
+        ret[end] = comment
+
+    return ret
@@ -0,0 +1,115 @@
+# vim: ts=4:sw=4
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from lib.analysis import worker
+
+
+class Saturated(Exception):
+    """ Raised when the pool already holds as much work as it may queue.
+    """
+
+
+class Pool:
+    """ A pool of warm analysis workers shared by the requests of a server.
+
+    Each worker loads the prelude as it starts. At most `queue` submissions
+    may be queued or running at once; submitting more raises Saturated
+    instead of waiting.
+    """
+
+    def __init__(self, workers=None, queue=None, prelude=None, cache_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue = queue
+        self.prelude = prelude
+        self.cache_dir = cache_dir
+        self.executor = None
+        self.slots = threading.BoundedSemaphore(queue) if queue else None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """ Starts the workers and waits for them to be warm.
+        """
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    initializer=worker.initialize,
+                                                    initargs=(self.prelude, self.cache_dir,))
+                executor = self.executor
+            else:
+                return
+
+        # Run one (empty) job per worker so every initializer has run
+        for future in [executor.submit(worker.warm) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, submissions):
+        """ Queues the analysis of each of the given submissions.
+
+        Either every submission is queued or, when there is no room for all of
+        them, none are and Saturated is raised.
+
+        :returns: A list of futures, one per submission.
+        """
+        acquired = 0
+        if self.slots is not None:
+            for _ in submissions:
+                if not self.slots.acquire(blocking=False):
+                    for _ in range(acquired):
+                        self.slots.release()
+                    raise Saturated(f"more than {self.queue} submissions queued")
+                acquired += 1
+
+        ret = []
+        try:
+            for submission in submissions:
+                ret.append(self._submit(submission))
+                if self.slots is not None:
+                    # Timed out work still holds its slot until it is done
+                    ret[-1].add_done_callback(lambda future: self.slots.release())
+                    acquired -= 1
+        finally:
+            for _ in range(acquired):
+                self.slots.release()
+
+        return ret
+
+    def _submit(self, submission):
+        if self.executor is None:
+            self.start()
+
+        try:
+            return self.executor.submit(worker.analyze, submission)
+        except BrokenProcessPool:
+            # A worker died (and took the pool with it): start over
+            self.recover()
+            self.start()
+            return self.executor.submit(worker.analyze, submission)
+
+    def recover(self):
+        """ Throws away the workers if one of them died, taking the others
+        with it. They are started again by the next submission.
+        """
+        with self.lock:
+            executor = self.executor
+            if executor is None:
+                return
+
+            try:
+                # Only a broken pool refuses work
+                executor.submit(worker.warm)
+                return
+            except BrokenProcessPool:
+                self.executor = None
+
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,183 @@
+# vim: ts=4:sw=4
+import copyreg
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+
+from esprima import parseScript
+from esprima.objects import Object as EsprimaObject
+
+# Structural Nodes
+from lib.nodes.structural_node import StructuralNode
+from lib.nodes.program_node import ProgramNode
+
+from lib.analysis.call_graph import CallGraph
+from lib.analysis.overlay import Overlay
+
+
+# Where expanded preludes are persisted between runs.
+CACHE_DIR = os.getenv('PYVALIDATE_CACHE',
+                      os.path.join(os.path.expanduser('~'), '.cache', 'pyvalidate'))
+
+
+def _setNodeState(node, state):
+    """ Restores the attributes of an unpickled esprima node.
+    """
+    node.__dict__.update(state)
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """ Pickles an expanded context including the esprima nodes it refers to.
+
+    esprima nodes answer every unknown attribute with None, which includes
+    `__setstate__`, so they cannot be restored by the default protocol. The
+    shared EMPTY container is pickled by reference so it stays shared.
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, EsprimaObject):
+            return (copyreg.__newobj__, (type(obj),), obj.__dict__, None, None, _setNodeState)
+
+        if obj is StructuralNode.EMPTY:
+            return (getattr, (StructuralNode, 'EMPTY',))
+
+        return NotImplemented
+
+
+class Prelude:
+    """ The library code (precode.js, math.js, ...) every submission runs against.
+
+    The prelude is parsed and expanded into a ProgramNode once. That snapshot
+    is persisted to disk, keyed by a fingerprint of the prelude sources, so
+    later processes only have to load it.
+
+    The loaded context is frozen and shared by every analysis in the process;
+    each analysis works on its own Overlay of it.
+    """
+
+    # Bump whenever the shape of the structural nodes changes so old
+    # snapshots on disk are no longer considered.
+    VERSION = 7
+
+    def __init__(self, sources, cache_dir=None):
+        """ Constructs a prelude out of the given list of source strings.
+
+        Pass `cache_dir=False` to never persist the snapshot.
+        """
+        self.sources = list(sources)
+        self.cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+        self.shared = None
+        self.graph = None
+        self._fingerprint = None
+
+    @staticmethod
+    def fromFiles(paths, cache_dir=None):
+        """ Constructs a prelude out of the given list of JavaScript files.
+        """
+        sources = []
+        for path in paths:
+            with open(path, 'r') as f:
+                sources.append(f.read())
+
+        return Prelude(sources, cache_dir=cache_dir)
+
+    def fingerprint(self):
+        """ Returns a digest identifying these prelude sources.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256(f'prelude:{Prelude.VERSION}\n'.encode('utf-8'))
+            for source in self.sources:
+                data = source.encode('utf-8')
+                digest.update(f'{len(data)}\n'.encode('utf-8'))
+                digest.update(data)
+            self._fingerprint = digest.hexdigest()
+
+        return self._fingerprint
+
+    def path(self):
+        """ Returns the path of the on-disk snapshot, if persisting is enabled.
+        """
+        if not self.cache_dir:
+            return None
+
+        return os.path.join(self.cache_dir, f'prelude-{self.fingerprint()}.pickle')
+
+    def load(self):
+        """ Loads (or builds and persists) the expanded prelude.
+        """
+        path = self.path()
+        if path:
+            try:
+                with open(path, 'rb') as f:
+                    context = pickle.load(f)
+
+                # Make sure it is something we can actually use
+                if isinstance(context, ProgramNode):
+                    return context
+            except Exception:
+                # Missing, stale or corrupt: rebuild it
+                pass
+
+        context = self.build()
+
+        if path:
+            self._persist(path, self._serialize(context))
+
+        return context
+
+    def build(self):
+        """ Parses and expands the prelude sources into a fresh ProgramNode.
+        """
+        from lib.analysis.analyzer import Analyzer
+
+        text = "".join(self.sources)
+        ast = parseScript(text, Analyzer.PARSE_OPTIONS)
+
+        return Analyzer(None)._expand(ast, text, ast, ProgramNode(ast))
+
+    def context(self):
+        """ Returns the frozen, shared expanded prelude.
+        """
+        if self.shared is None:
+            shared = self.load()
+            shared.freeze()
+            self.shared = shared
+
+        return self.shared
+
+    def callGraph(self):
+        """ Returns the CallGraph of the shared prelude, which the call graph
+        of every analysis extends.
+        """
+        if self.graph is None:
+            self.graph = CallGraph(self.context())
+
+        return self.graph
+
+    def instantiate(self):
+        """ Returns a copy-on-write view of the expanded prelude for one analysis.
+        """
+        return Overlay(self.context()).root
+
+    def _serialize(self, context):
+        buffer = io.BytesIO()
+        _SnapshotPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(context)
+        return buffer.getvalue()
+
+    def _persist(self, path, snapshot):
+        """ Atomically writes the snapshot so concurrent readers never see a
+        partial file.
+        """
+        tmp = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix='.prelude-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(snapshot)
+            os.replace(tmp, path)
+        except OSError:
+            # Persisting is only an optimization
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
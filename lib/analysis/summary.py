@@ -0,0 +1,161 @@
+# vim: ts=4:sw=4
+from lib.nodes.structural_node import StructuralNode
+from lib.values.value import Value
+
+
+class Summary:
+    """ Records what calling a function with particular arguments amounts to.
+
+    While the body of the callee is annotated, the Analyzer reports every
+    side effect to the summaries being recorded: instantiations and raises
+    (which are replayed when the summary is reused), variables read from
+    outside the call (which must still hold the same Value for the summary to
+    apply) and stores (which make the call impure when they reach outside of
+    it).
+    """
+
+    def __init__(self, callee, arguments):
+        """ Starts the summary for the given callee.
+
+        The `arguments` are retained so their identities stay valid as part of
+        the cache key.
+        """
+        self.callee = callee
+        self.arguments = arguments
+        self.value = None
+        self.effects = []
+        self.reads = []
+        self.allocated = {}
+        # The contexts of the calls made are within their callee
+        self.frames = set([id(callee)])
+        self.pure = True
+
+    def local(self, node):
+        """ Determines if the given node only exists within this call.
+        """
+        while node is not None:
+            if id(node) in self.frames:
+                return True
+            node = node.parent if isinstance(node, StructuralNode) else None
+
+        return False
+
+    def enter(self, callee):
+        """ Notes a call made while annotating this one.
+        """
+        self.frames.add(id(callee))
+
+    def effect(self, function, args):
+        """ Notes a side effect to replay whenever this summary is used.
+        """
+        self.effects.append((function, args,))
+
+    def allocate(self, reference):
+        """ Notes an object created during this call.
+        """
+        self.allocated[id(reference)] = reference
+
+    def load(self, variable):
+        """ Notes the given variable was read.
+        """
+        if not self.local(variable):
+            self.reads.append((variable, variable.get_value(),))
+
+    def store(self, target):
+        """ Notes the given variable (or object) was written.
+        """
+        if id(target) in self.allocated:
+            return
+
+        if not self.local(target):
+            self.pure = False
+
+    def valid(self):
+        """ Determines if everything read from outside still holds the same Value.
+        """
+        for variable, value in self.reads:
+            if variable.get_value() is not value:
+                return False
+
+        return True
+
+    def apply(self, analyzer):
+        """ Replays the effects of this call and returns its value.
+        """
+        for function, args in self.effects:
+            analyzer._effect(function, *args)
+
+        # The call allocates at the same sites again
+        for reference in self.allocated.values():
+            reference.allocate()
+            analyzer._allocate(reference)
+
+        for variable, value in self.reads:
+            analyzer._load(variable)
+
+        return self.value
+
+
+class Fixpoint:
+    """ The summaries of the functions of a recursive component, while they
+    are being computed.
+
+    Calls between the functions of the component are not followed. Each call
+    instead joins its arguments into the ones its callee is analyzed with and
+    gets the Value the callee was found to return so far. The functions are
+    analyzed again until neither changes, which widening guarantees.
+    """
+
+    def __init__(self, node, widen_after):
+        self.node = node
+        self.widen_after = widen_after
+        self.iteration = 0
+        self.changed = False
+
+        # The callee, arguments, 'this' and return Value of each function
+        # called so far, by definition
+        self.entries = {}
+
+    def _join(self, before, after):
+        joined = Value.join(self.node, before, after)
+        if self.iteration >= self.widen_after:
+            joined = Value.widen(self.node, before, joined)
+
+        if joined is not before:
+            self.changed = True
+
+        return joined
+
+    def call(self, callee, arguments, this):
+        """ Notes a call within the component and returns its Value so far.
+        """
+        entry = self.entries.get(callee.node)
+        if entry is None:
+            self.entries[callee.node] = [callee, list(arguments), this, None]
+            self.changed = True
+            return Value(self.node).intern()
+
+        params = entry[1]
+        for i, argument in enumerate(arguments):
+            if i < len(params):
+                params[i] = self._join(params[i], argument)
+            else:
+                params.append(argument)
+                self.changed = True
+
+        if entry[3] is None:
+            # Nothing is known to be returned yet
+            return Value(self.node).intern()
+
+        return entry[3]
+
+    def returned(self, callee, value):
+        """ Joins the given Value into the ones the callee is known to return.
+        """
+        entry = self.entries[callee.node]
+        entry[3] = self._join(entry[3], value)
+
+    def value(self, callee):
+        """ Returns the Value the given callee was found to return.
+        """
+        return self.entries[callee.node][3]
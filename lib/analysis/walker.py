@@ -0,0 +1,140 @@
+# vim: ts=4:sw=4
+from types import GeneratorType
+
+
+class Walker:
+    """ Walks an AST, phase by phase, without recursing in Python.
+
+    Each phase ('expand', 'annotate', 'value') has a table of handlers keyed by
+    node type, so finding the handler of a node is a single lookup. A handler
+    is called as `handler(walk, node, context)` and either returns its result
+    or is a generator. A generator asks for a node to be walked by yielding
+    `(phase, node, context)` and is sent back the result:
+
+        value = yield ('value', node.right, context)
+
+    The walk keeps those generators on its own stack, so how deeply a program
+    nests is not limited by the interpreter's recursion limit.
+
+    A phase may also have a compiler, which turns a node into a closure
+    `fn(walk, context)` (or None). Compiled nodes are evaluated by calling
+    their closure instead of their handler.
+
+    Walking a node of a phase with an exhaustion handler spends a step of
+    the Budget of the analyzer. Once it runs out, nodes of that phase are
+    given to that handler instead, which stands in for their result.
+    """
+
+    # Handlers by phase and then by node type (None for the fallback)
+    HANDLERS = {}
+
+    # Compilers by phase
+    COMPILERS = {}
+
+    # Handlers standing in for any node once the budget is spent, by phase
+    EXHAUSTED = {}
+
+    @staticmethod
+    def handles(phase, *types):
+        """ Registers the decorated function as the handler of the given node
+        types within the given phase.
+        """
+        def register(handler):
+            table = Walker.HANDLERS.setdefault(phase, {})
+            for type in types:
+                table[type] = handler
+            return handler
+
+        return register
+
+    @staticmethod
+    def compiles(phase):
+        """ Registers the decorated function as the compiler of the given phase.
+        """
+        def register(compiler):
+            Walker.COMPILERS[phase] = compiler
+            return compiler
+
+        return register
+
+    @staticmethod
+    def exhausts(phase):
+        """ Registers the decorated function as the exhaustion handler of the
+        given phase.
+        """
+        def register(handler):
+            Walker.EXHAUSTED[phase] = handler
+            return handler
+
+        return register
+
+    def __init__(self, analyzer, text, ast):
+        """ Prepares a walk over the given (root) AST and its source text.
+        """
+        self.analyzer = analyzer
+        self.text = text
+        self.ast = ast
+        self.budget = analyzer.budget
+
+    def walk(self, phase, node, context):
+        """ Walks the given node and returns the result of its handler.
+        """
+        stack = []
+        value = None
+        error = None
+
+        try:
+            value = self.dispatch(phase, node, context)
+        except Exception as e:
+            error = e
+
+        while True:
+            if error is None and isinstance(value, GeneratorType):
+                stack.append(value)
+                value = None
+
+            if not stack:
+                if error is not None:
+                    raise error
+                return value
+
+            try:
+                if error is not None:
+                    error, request = None, stack[-1].throw(error)
+                else:
+                    request = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+                continue
+            except Exception as e:
+                # Unwind into the handler that asked for this one
+                stack.pop()
+                error = e
+                continue
+
+            try:
+                value = self.dispatch(*request)
+            except Exception as e:
+                error = e
+
+    def dispatch(self, phase, node, context):
+        """ Calls the handler (or the compiled closure) for the given node.
+        """
+        if self.budget is not None:
+            exhausted = Walker.EXHAUSTED.get(phase)
+            if exhausted is not None and not self.budget.spend():
+                return exhausted(self, node, context)
+
+        compiler = Walker.COMPILERS.get(phase)
+        if compiler is not None:
+            compiled = compiler(node)
+            if compiled is not None:
+                return compiled(self, context)
+
+        table = Walker.HANDLERS[phase]
+        handler = table.get(node.type)
+        if handler is None:
+            handler = table[None]
+
+        return handler(self, node, context)
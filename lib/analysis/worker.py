@@ -0,0 +1,148 @@
+# vim: ts=4:sw=4
+import os
+import traceback
+
+from lib.analysis.analyzer import Analyzer
+from lib.analysis.budget import Budget
+from lib.analysis.cache import ResultCache
+from lib.analysis.fingerprint import Fingerprint
+from lib.analysis.grader import Grader
+from lib.analysis.prelude import Prelude
+
+
+# The library code every submission runs against, by default.
+PRELUDE_FILES = ['math.js', 'precode.js']
+
+# The prelude and result cache of this process (see initialize)
+_prelude = None
+_cache = None
+
+
+def initialize(paths=None, cache_dir=None):
+    """ Loads the prelude of this (worker) process.
+
+    This is meant as the initializer of a process pool, so each worker parses
+    (or loads) and expands the prelude once, before it sees any submission.
+
+    Pass `cache_dir=False` to neither persist the prelude nor cache results.
+    """
+    global _prelude, _cache
+
+    prelude = Prelude.fromFiles(paths or PRELUDE_FILES, cache_dir=cache_dir)
+    prelude.context()
+    _prelude = prelude
+
+    _cache = None
+    if cache_dir is not False:
+        _cache = ResultCache(os.path.join(cache_dir, 'results') if cache_dir else None)
+
+
+def warm():
+    """ Does nothing, but only once the prelude of this process is loaded.
+    """
+    if _prelude is None:
+        initialize()
+
+
+def report(code):
+    """ Returns what grading needs to know about the analysis of the code.
+
+    This is the `counts` of the names the program declares (see Grader), the
+    exceptions it might have `raised` (how many times each is raised), how
+    many distinct `errors` of each there are (see Diagnostics) and the limits
+    of its Budget it reached, if any, making the analysis `partial`.
+
+    Reports are cached by the code and prelude, so identical submissions are
+    only ever parsed once. They are also cached by the Fingerprint of the
+    code, so submissions differing only in formatting, comments or local
+    names are only ever analyzed once.
+
+    Reports only name globals (which fingerprints keep as they are), so a
+    report found by fingerprint applies to this code as it is.
+    """
+    budget = Budget()
+
+    keys = []
+    if _cache is not None:
+        keys.append(ResultCache.key(Analyzer.VERSION, _prelude.fingerprint(), budget.limits(), code))
+        ret = _cache.get(keys[0])
+        if ret is not None:
+            return ret
+
+        fingerprint = Fingerprint(code)
+        keys.append(ResultCache.key(Analyzer.VERSION, _prelude.fingerprint(), budget.limits(), 'ast', fingerprint.digest))
+        ret = _cache.get(keys[1])
+        if ret is not None:
+            _cache.put(keys[0], ret)
+            return ret
+
+    analyzer = Analyzer(code, prelude=_prelude, budget=budget)
+    context = analyzer.annotate()
+
+    ret = {
+        'counts': Grader.counts(context),
+        'raised': {exception: sum(item.occurrences for item in raised) for exception, raised in context.raised.items()},
+        'errors': {exception: len(raised) for exception, raised in context.raised.items()},
+        'partial': sorted(budget.exceeded),
+    }
+
+    # Running out of time depends on the load of the machine, not the code
+    if 'deadline' in budget.exceeded:
+        keys = []
+
+    for key in keys:
+        _cache.put(key, ret)
+
+    return ret
+
+
+def failed(submission, e):
+    """ The result of a submission that could not be analyzed at all (say,
+    because its worker died).
+    """
+    return {
+        'id': submission.get('id', submission.get('request_id')),
+        'ok': False,
+        'error': f'{type(e).__name__}: {e}',
+    }
+
+
+def analyze(submission):
+    """ Analyzes and grades a single submission.
+
+    The submission is a dict with the `code` and, optionally, an `id` and a
+    `rubric` (see Grader). Any failure is reported within the result rather
+    than raised, so one bad submission never takes down a batch.
+
+    :returns: A JSON-serializable dict with the `id`, whether the analysis
+              was `ok`, the graded `checks`, whether they all `passed`, the
+              exceptions the program might have `raised` (and the distinct
+              `errors`, see report) and whether the analysis was cut short
+              (`partial`, see Budget).
+    """
+    ret = {
+        'id': submission.get('id', submission.get('request_id')),
+        'ok': False,
+    }
+
+    try:
+        if _prelude is None:
+            initialize()
+
+        grader = Grader(submission.get('rubric'))
+
+        analysis = report(submission['code'])
+
+        ret['checks'] = grader.grade(analysis['counts'])
+        ret['passed'] = all(check['passed'] for check in ret['checks'])
+        ret['raised'] = analysis['raised']
+        ret['errors'] = analysis['errors']
+        ret['partial'] = bool(analysis['partial'])
+        if analysis['partial']:
+            ret['limits'] = analysis['partial']
+        ret['ok'] = True
+    except Exception as e:
+        ret['error'] = f'{type(e).__name__}: {e}'
+        ret['traceback'] = traceback.format_exc()
+
+    return ret
@@ -1,57 +1,73 @@
 # vim: ts=4:sw=4
 from lib.nodes.structural_node import StructuralNode
-from lib.values.raised import Raised
 
 
 class BlockNode(StructuralNode):
     """ A block within the program.
     """
 
+    __slots__ = ('variables', 'functions', 'classes', 'declarations', 'instantiates',)
+
     def __init__(self, node, parent, annotation=None):
         super().__init__(node, parent=parent, annotation=annotation)
-        self.variables = {}
-        self.functions = {}
-        self.classes = {}
-        self.declarations = []
-        self.raises = []
-        self.instantiates = {}
+        self.variables = StructuralNode.EMPTY
+        self.functions = StructuralNode.EMPTY
+        self.classes = StructuralNode.EMPTY
+        self.declarations = ()
+        self.instantiates = StructuralNode.EMPTY
 
         # TODO: just make use of this some other way
         if parent:
             self.condition = parent.condition
 
+    def members(self):
+        yield from super().members()
+        yield from self.variables.values()
+        yield from self.functions.values()
+        yield from self.classes.values()
+
+    def fork(self):
+        ret = super().fork()
+        ret.variables = StructuralNode._copy(self.variables)
+        ret.functions = StructuralNode._copy(self.functions)
+        ret.classes = StructuralNode._copy(self.classes)
+        ret.declarations = StructuralNode._copy(self.declarations)
+        if self.instantiates:
+            ret.instantiates = {klass: dict(info) for klass, info in self.instantiates.items()}
+        return ret
+
+    def adopt(self, original, fork):
+        super().adopt(original, fork)
+        for container in [self.variables, self.functions, self.classes]:
+            for name, member in container.items():
+                if member is original:
+                    container[name] = fork
+        if self.declarations:
+            self.declarations = [fork if member is original else member for member in self.declarations]
+
     def get_name(self):
         if hasattr(self.node, 'id') and hasattr(self.node.id, 'name'):
             return self.node.id.name
 
         return '{}'
 
-    def add_raises(self, exception, message):
-        """ Adds the possibility of a raised exception to this context.
-        """
-        ret = Raised(exception, message, self.condition)
-        self.raises.append(ret)
-
-        self.add_raised(ret)
-        return ret
-
     def add_variable(self, name, variable):
         """ Adds the variable declaration to this context.
         """
-        self.variables[name] = variable
-        self.declarations.append(variable)
+        self._dict('variables')[name] = variable
+        self._list('declarations').append(variable)
 
     def add_function(self, name, function):
         """ Adds the function declaration to this context.
         """
-        self.functions[name] = function
-        self.declarations.append(function)
+        self._dict('functions')[name] = function
+        self._list('declarations').append(function)
 
     def add_class(self, name, klass):
         """ Adds the class declaration to this context.
         """
-        self.classes[name] = klass
-        self.declarations.append(klass)
+        self._dict('classes')[name] = klass
+        self._list('declarations').append(klass)
 
     def add_instantiation(self, klass, count=1):
         """ Notes that this context might instantiate the given Class.
@@ -59,11 +75,12 @@ class BlockNode(StructuralNode):
         if self.parent:
             self.parent.add_instantiation(klass)
         else:
-            self.instantiates[klass] = self.instantiates.get(klass, {
+            instantiates = self._dict('instantiates')
+            instantiates[klass] = instantiates.get(klass, {
                 'instanced': 0
             })
 
-            self.instantiates[klass]['instanced'] += count
+            instantiates[klass]['instanced'] += count
 
     def add_instantiations(self, instantiations):
         """ Notes that this context might instantiate the given set of instantiations.
@@ -96,19 +113,27 @@ class BlockNode(StructuralNode):
         By default, it will also search the context above it.
         """
 
-        if name in self.variables:
-            return self.variables[name]
+        # Plain blocks are searched in a loop so deeply nested code does not
+        # run out of stack
+        context = self
+        while True:
+            if name in context.variables:
+                return context._thaw(context.variables[name])
+
+            if name in context.functions:
+                return context._thaw(context.functions[name])
 
-        if name in self.functions:
-            return self.functions[name]
+            if name in context.classes:
+                return context._thaw(context.classes[name])
 
-        if name in self.classes:
-            return self.classes[name]
+            parent = context.parent
+            if not recurse or not parent:
+                return None
 
-        if recurse and self.parent:
-            return self.parent.lookup(name)
+            if type(parent).lookup is not BlockNode.lookup:
+                return parent.lookup(name)
 
-        return None
+            context = parent
 
     def to_string(self, indent=""):
         lines = []
@@ -135,6 +160,7 @@ class BlockNode(StructuralNode):
             lines.append(f'{indent}instantiates {klass.get_name()}: {info.get("instanced", 0)}')
 
         for exception, raised in self.raised.items():
-            lines.append(f'{indent}raises {exception}: {len(raised)} times')
+            occurrences = sum(item.occurrences for item in raised)
+            lines.append(f'{indent}raises {exception}: {occurrences} times')
 
         return lines
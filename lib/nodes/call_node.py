@@ -4,20 +4,78 @@ from lib.nodes.method_node import MethodNode
 from lib.nodes.variable_node import VariableNode
 from lib.nodes.function_block_node import FunctionBlockNode
 from lib.values.value import Value
+from lib.analysis.summary import Summary, Fixpoint
 
 
 class CallNode(StructuralNode):
     """ Manages the context around a function call.
     """
 
-    def valueOf(self, callee, text, ast, context, this=None):
+    __slots__ = ()
+
+    def valueOf(self, callee, walk, context, this=None):
         """ Negotate a Value for the given call of this function.
 
-        Call is an AST node representing a CallExpression.
+        Call is an AST node representing a CallExpression. This is a handler
+        of the given Walker (see Walker), so it is used with `yield from`.
         """
 
+        ast = walk.analyzer
+
+        # Determine the values of the arguments within the calling context
+        arguments = []
+        for argument in self.node.arguments:
+            arguments.append((yield ('value', argument, context)))
+
+        # Calls back into a recursive component being solved are not followed
+        component = None
+        if ast.graph is not None:
+            component = ast.graph.componentOf(callee)
+
+        if component is not None and component in ast.fixpoints:
+            return ast.fixpoints[component].call(callee, arguments, this)
+
+        # Calls with the same callee, arguments and 'this' share their summary.
+        # Values are interned, so they are the same exactly when they are
+        # identical (and the summary keeps them alive).
+        # The key holds the context this call is made within, but not this
+        # call site, so every site making the same call shares the summary
+        # (and the objects it allocates).
+        key = (
+            callee,
+            tuple(id(argument) for argument in arguments),
+            id(this),
+            ast._calling(),
+        )
+
+        summary = ast.summaries.get(key)
+        if summary is not None and summary.valid():
+            return summary.apply(ast)
+
+        if not ast.budget.enter():
+            # Too deep (or out of budget) to follow: it could return anything
+            return Value(self.node, 'variant', None, context.condition).intern()
+
+        if component is None:
+            def annotate():
+                return self._annotateBody(callee, walk, arguments, this)
+        else:
+            def annotate():
+                return self._solve(callee, walk, component, arguments, this)
+
+        summary = Summary(callee, arguments + [this])
+        ast.callers.append(self.node)
+        try:
+            return (yield from ast.summarize(key, summary, annotate))
+        finally:
+            ast.budget.leave()
+            ast.callers.pop()
+
+    def _annotateBody(self, callee, walk, arguments, this):
+        """ Annotates the body of the callee for the given arguments and
+        returns the Value it returns.
+        """
         definition = None
-        body = None
         if isinstance(callee, MethodNode) or callee.node.static:
             # This is a method of a class
             definition = callee.node.value
@@ -31,27 +89,61 @@ class CallNode(StructuralNode):
         if this is not None:
             callee_context.add_variable('this', this)
 
+        # Parameter types documented for the function, if any
+        types = callee.annotation.get('params', {})
+
         i = 0
         for param in definition.params:
-            # TODO: annotate the type of the variable
-            variable = VariableNode(param, callee, annotation=None)
-            variable.set_value(Value.valueOf(self.node.arguments[i], text, ast, context))
+            annotation = {}
+            if types.get(param.name):
+                annotation['type'] = types[param.name]
+
+            variable = VariableNode(param, callee, annotation=annotation)
+            if i < len(arguments):
+                variable.set_value(arguments[i])
             callee.add_variable(param.name, variable)
             i += 1
 
         # Now, evaluate the return Value by going through the function body
-        body = definition.body
-
         # TODO: add a 'return undefined;' line at the bottom of the function.
-        ast._annotate(body, text, ast.ast, callee_context)
+        yield ('annotate', definition.body, callee_context)
 
-        #print('determining value of call')
-        #for subnode in body:
-        #    Value.valueOf(subnode, text, ast, callee_context)
+        if walk.budget.exhausted:
+            # Part of the body was skipped, so it may return anything
+            callee_context.add_return(Value(self.node, 'variant').intern())
 
         # Return the accumulated value by inspecting the
         # return statements.
 
         # Get possible returns / raises
-        value = Value.combine(callee, callee_context.returns, halt_if_true=True)
-        return value
+        return Value.combine(callee, callee_context.returns, halt_if_true=True)
+
+    def _solve(self, callee, walk, component, arguments, this):
+        """ Annotates the functions of the recursive component of the callee
+        until what they are called with and what they return is stable.
+
+        Every function of the component is analyzed once per round, with the
+        join of the arguments of every call to it, so the result covers all of
+        those calls. The Value the callee returns is then returned.
+        """
+        ast = walk.analyzer
+
+        fixpoint = Fixpoint(self.node, ast.WIDEN_AFTER)
+        fixpoint.call(callee, arguments, this)
+
+        ast.fixpoints[component] = fixpoint
+        try:
+            while fixpoint.changed:
+                fixpoint.changed = False
+                for member, member_arguments, member_this, _ in list(fixpoint.entries.values()):
+                    value = yield from self._annotateBody(member, walk, member_arguments, member_this)
+                    fixpoint.returned(member, value)
+
+                fixpoint.iteration += 1
+                if fixpoint.iteration >= ast.LOOP_LIMIT:
+                    # Give up on knowing what it returns
+                    return Value(self.node, 'variant').intern()
+        finally:
+            del ast.fixpoints[component]
+
+        return fixpoint.value(callee)
@@ -5,11 +5,31 @@ class ClassNode(BlockNode):
     """ Represents a class within the code.
     """
 
+    __slots__ = ('instanced', 'methods', 'properties',)
+
     def __init__(self, node, parent, annotation=None):
         super().__init__(node, parent=parent, annotation=annotation)
         self.instanced = 0
-        self.methods = {}
-        self.properties = {}
+        self.methods = BlockNode.EMPTY
+        self.properties = BlockNode.EMPTY
+
+    def members(self):
+        yield from super().members()
+        yield from self.methods.values()
+        yield from self.properties.values()
+
+    def fork(self):
+        ret = super().fork()
+        ret.methods = BlockNode._copy(self.methods)
+        ret.properties = BlockNode._copy(self.properties)
+        return ret
+
+    def adopt(self, original, fork):
+        super().adopt(original, fork)
+        for container in [self.methods, self.properties]:
+            for name, member in container.items():
+                if member is original:
+                    container[name] = fork
 
     def name(self):
         """ Get the common name for this class.
@@ -28,21 +48,21 @@ class ClassNode(BlockNode):
 
     def add_call(self, name, node, condition=None):
         # Called a static method
-        self.functions[name].add_call(node, condition=condition)
+        self._thaw(self.functions[name]).add_call(node, condition=condition)
 
     def add_method(self, name, method):
         """ Adds the annotated method to the class context.
         """
 
         if name not in self.methods:
-            self.methods[name] = method
+            self._dict('methods')[name] = method
 
     def add_property(self, name, prop):
         """ Adds the annotated property to the class context.
         """
 
         if name not in self.properties:
-            self.properties[name] = prop
+            self._dict('properties')[name] = prop
 
     def lookup(self, name, recurse=True):
         """ Looks up the given name and returns the information block for it.
@@ -53,10 +73,10 @@ class ClassNode(BlockNode):
         """
 
         if name in self.methods:
-            return self.methods[name]
+            return self._thaw(self.methods[name])
 
         if name in self.properties:
-            return self.properties[name]
+            return self._thaw(self.properties[name])
 
         return super().lookup(name, recurse=recurse)
 
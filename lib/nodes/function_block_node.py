@@ -6,9 +6,16 @@ class FunctionBlockNode(BlockNode):
     """ A block that serves as the main context of a function.
     """
 
+    __slots__ = ('returns',)
+
     def __init__(self, node, parent, annotation=None):
         super().__init__(node, parent=parent, annotation=annotation)
-        self.returns = []
+        self.returns = ()
+
+    def fork(self):
+        ret = super().fork()
+        ret.returns = BlockNode._copy(self.returns)
+        return ret
 
     def add_return(self, value):
-        self.returns.append(value)
+        self._list('returns').append(value)
@@ -1,43 +1,47 @@
 # vim: ts=4:sw=4
 from lib.nodes.block_node import BlockNode
-from lib.nodes.variable_node import VariableNode
-from lib.values.value import Value
 
 
 class FunctionNode(BlockNode):
     """ Holds information about a function.
     """
 
+    __slots__ = ('calls', 'called', 'called_conditionally',)
+
     def __init__(self, node, parent, annotation=None):
         super().__init__(node, parent=parent, annotation=annotation)
-        self.calls = {}
+        self.calls = BlockNode.EMPTY
         self.called = 0
-        self.called_conditionally = {}
+        self.called_conditionally = BlockNode.EMPTY
 
-    def add_raised(self, raised):
-        self.raised[raised.exception] = self.raised.get(raised.exception, [])
-        self.raised[raised.exception].append(raised)
+    def fork(self):
+        ret = super().fork()
+        ret.calls = BlockNode._copy(self.calls)
+        ret.called_conditionally = BlockNode._copy(self.called_conditionally)
+        return ret
 
     def add_call(self, node, condition=None):
         """ Adds a reference to this function being called.
         """
 
         if node not in self.calls:
-            self.calls[node] = node
+            self._dict('calls')[node] = node
             if condition is None:
                 self.called += 1
             else:
-                self.called_conditionally[condition] = self.called_conditionally.get(condition, 0)
-                self.called_conditionally[condition] += 1
+                called_conditionally = self._dict('called_conditionally')
+                called_conditionally[condition] = called_conditionally.get(condition, 0)
+                called_conditionally[condition] += 1
 
     def add_instantiation(self, klass, count=1):
         """ Notes that this function, when called, might instantiate the given Class.
         """
-        self.instantiates[klass] = self.instantiates.get(klass, {
+        instantiates = self._dict('instantiates')
+        instantiates[klass] = instantiates.get(klass, {
             'instanced': 0
         })
 
-        self.instantiates[klass]['instanced'] += count
+        instantiates[klass]['instanced'] += count
 
     def add_instantiations(self, instantiations):
         for klass, info in instantiations.items():
@@ -4,3 +4,5 @@ from lib.nodes.function_node import FunctionNode
 class MethodNode(FunctionNode):
     """ Holds information about a method of a class.
     """
+
+    __slots__ = ()
@@ -5,5 +5,10 @@ class ProgramNode(BlockNode):
     """ The main context for the entire program.
     """
 
+    __slots__ = ('diagnostics',)
+
     def __init__(self, node):
         super().__init__(node, parent=None)
+
+        # The Diagnostics of the analysis this is the root of
+        self.diagnostics = None
@@ -5,6 +5,8 @@ class PropertyNode(StructuralNode):
     """ Holds information about a property (which is up to two methods).
     """
 
+    __slots__ = ('readable', 'writable', 'setter', 'getter',)
+
     def __init__(self, node, parent, annotation=None, readable=False, writable=False):
         super().__init__(node, parent=parent, annotation=annotation)
         self.readable = readable
@@ -12,6 +14,19 @@ class PropertyNode(StructuralNode):
         self.setter = None
         self.getter = None
 
+    def members(self):
+        yield from super().members()
+        for method in [self.setter, self.getter]:
+            if method is not None:
+                yield method
+
+    def adopt(self, original, fork):
+        super().adopt(original, fork)
+        if self.setter is original:
+            self.setter = fork
+        if self.getter is original:
+            self.getter = fork
+
     def add_setter(self, method):
         """ Adds a Method that acts as a setter.
         """
@@ -1,45 +1,145 @@
 # vim: ts=4:sw=4
+import copy
+
+from types import MappingProxyType
+
+
 class StructuralNode:
     """ Keeps track of analysis context.
 
     This is subclassed for different types of context: functions, classes, etc.
+
+    Most containers stay empty for most nodes. They start out as the shared
+    EMPTY mapping (or an empty tuple) and are only allocated on first write.
     """
 
+    __slots__ = (
+        'node', 'annotation', 'parent', 'conditions', 'condition', 'children',
+        'frozen', 'overlay', 'origin',
+    )
+
+    # The container of every node with nothing in it (read-only)
+    EMPTY = MappingProxyType({})
+
     def __init__(self, node, parent=None, annotation=None):
         self.node = node
-        self.annotation = annotation or {}
+        self.annotation = annotation or StructuralNode.EMPTY
         self.parent = parent
-        self.conditions = []
+        self.conditions = ()
         self.condition = None
-        self.children = {}
-        self.raised = {}
+        self.children = StructuralNode.EMPTY
+
+        # Shared (prelude) nodes are frozen and only ever copied into the
+        # Overlay of the analysis that touches them.
+        self.frozen = False
+        self.overlay = None
+        self.origin = None
 
         if parent:
+            self.overlay = parent.overlay
             parent.add_child(node, self)
 
     def find(self, node):
         """ Finds the context defined by the given node.
         """
-        return self.children.get(f"{node.range[0]}.{node.range[1]}", None)
+        return self._thaw(self.children.get(f"{node.range[0]}.{node.range[1]}", None))
+
+    def members(self):
+        """ Yields every structural node this node directly holds.
+        """
+        yield from self.children.values()
+
+    def freeze(self):
+        """ Marks this node, and everything it holds, as shared and immutable.
+        """
+        self.frozen = True
+        for member in self.members():
+            if not member.frozen:
+                member.freeze()
+
+    def fork(self):
+        """ Returns a mutable copy of this node.
+
+        Containers are copied so the copy can be updated without affecting
+        this node. The nodes they hold are shared until they are thawed.
+        """
+        ret = copy.copy(self)
+        ret.frozen = False
+        ret.origin = self
+        ret.conditions = StructuralNode._copy(self.conditions)
+        ret.children = StructuralNode._copy(self.children)
+        return ret
+
+    @staticmethod
+    def _copy(container):
+        """ Copies the given container, leaving empty ones unallocated.
+        """
+        if not container:
+            return container
+
+        return type(container)(container)
+
+    def _dict(self, name):
+        """ Returns the named dict container, allocating it if necessary.
+        """
+        ret = getattr(self, name)
+        if ret is StructuralNode.EMPTY:
+            ret = {}
+            setattr(self, name, ret)
+
+        return ret
+
+    def _list(self, name):
+        """ Returns the named list container, allocating it if necessary.
+        """
+        ret = getattr(self, name)
+        if ret == ():
+            ret = []
+            setattr(self, name, ret)
+
+        return ret
+
+    def adopt(self, original, fork):
+        """ Replaces the given shared node with its copy within our containers.
+        """
+        for key, child in self.children.items():
+            if child is original:
+                self.children[key] = fork
+
+    def _thaw(self, node):
+        """ Returns the copy of the given node private to this analysis.
+        """
+        if node is None or not node.frozen or self.overlay is None:
+            return node
+
+        return self.overlay.thaw(node)
+
+    @property
+    def raised(self):
+        """ The exceptions raised within this context, as lists of Raised by
+        exception. These are kept by the Diagnostics of the analysis.
+        """
+        root = self
+        while root.parent is not None:
+            root = root.parent
 
-    def add_raised(self, raised):
-        self.raised[raised.exception] = self.raised.get(raised.exception, [])
-        self.raised[raised.exception].append(raised)
+        diagnostics = getattr(root, 'diagnostics', None)
+        if diagnostics is None:
+            return StructuralNode.EMPTY
 
-        if self.parent:
-            self.parent.add_raised(raised)
+        return diagnostics.raised(self)
 
     def add_child(self, node, context):
         """ Adds the given child.
         """
 
-        self.children[f"{node.range[0]}.{node.range[1]}"] = context
+        self._dict('children')[f"{node.range[0]}.{node.range[1]}"] = context
 
     def add_condition(self, value):
         """ Adds the given Value as the condition on which code is now assuming.
         """
 
-        self.conditions.append(self.condition)
+        self._list('conditions').append(self.condition)
         if self.condition is None:
             self.condition = value
         else:
@@ -5,6 +5,8 @@ class VariableNode(StructuralNode):
     """ Holds information about a variable.
     """
 
+    __slots__ = ('value',)
+
     def __init__(self, node, parent, annotation):
         super().__init__(node, parent=parent, annotation=annotation)
         self.value = None
@@ -0,0 +1,154 @@
+# vim: ts=4:sw=4
+import math
+import operator
+
+from lib.values.interval import Interval
+from lib.values.string_summary import StringSummary
+
+
+class Arithmetic:
+    """ Applies operators to the payloads of Values as JavaScript would.
+
+    JavaScript numbers are doubles, so no result needs to be larger than a
+    double. Integers beyond MAX_SAFE_INTEGER become floats, exponents that
+    would overflow give Infinity (without computing the power first), shifts
+    work on 32-bit integers and long strings are summarized (see
+    StringSummary). No single operation, however large its operands, takes
+    more than a moment or more than a little memory.
+    """
+
+    # Integers larger than this cannot be exactly represented in JavaScript
+    MAX_SAFE_INTEGER = 2 ** 53 - 1
+
+    # Operators that may take strings (and then their bounded implementation)
+    STRING_OPERATIONS = {
+        operator.add: StringSummary.concat,
+        operator.eq: operator.eq,
+        operator.ne: operator.ne,
+        operator.lt: operator.lt,
+        operator.le: operator.le,
+        operator.gt: operator.gt,
+        operator.ge: operator.ge,
+    }
+
+    @staticmethod
+    def apply(operation, a, b):
+        """ Returns `operation(a, b)`, bounded in size.
+
+        Raises TypeError (or ValueError, ArithmeticError) for any operation
+        that cannot be computed, as the operation itself would.
+        """
+        if isinstance(a, (str, StringSummary,)) or isinstance(b, (str, StringSummary,)):
+            string_operation = Arithmetic.STRING_OPERATIONS.get(operation)
+            if string_operation is None:
+                # Python would repeat or format the string
+                raise TypeError('not an operation on strings')
+
+            if operation is operator.add and not (isinstance(a, (str, StringSummary,)) and
+                                                  isinstance(b, (str, StringSummary,))):
+                raise TypeError('can only concatenate strings')
+
+            return string_operation(a, b)
+
+        # Operators that could explode are computed their own way
+        if operation is operator.pow:
+            return Arithmetic.number(Arithmetic.power(a, b))
+        elif operation is operator.mod:
+            return Arithmetic.remainder(a, b)
+        elif operation is operator.lshift:
+            return Arithmetic.leftShift(a, b)
+        elif operation is operator.rshift:
+            return Arithmetic.rightShift(a, b)
+
+        return Arithmetic.number(operation(a, b))
+
+    @staticmethod
+    def number(value):
+        """ Returns the given result as a JavaScript number would hold it.
+        """
+        if isinstance(value, Interval):
+            low = Arithmetic.number(value.low)
+            high = Arithmetic.number(value.high)
+            if low is not value.low or high is not value.high:
+                return Interval(low, high)
+            return value
+
+        if isinstance(value, int) and not isinstance(value, bool) and abs(value) > Arithmetic.MAX_SAFE_INTEGER:
+            try:
+                return float(value)
+            except OverflowError:
+                return math.inf if value > 0 else -math.inf
+
+        return value
+
+    @staticmethod
+    def power(a, b):
+        """ Computes `a ** b` without building a number larger than a double.
+        """
+        if isinstance(a, Interval) or isinstance(b, Interval):
+            # Interval powers are computed over doubles already
+            return Interval.of(a) ** b
+
+        if isinstance(a, int) and isinstance(b, int) and b >= 0:
+            # Exact, when the result is small enough to be
+            if abs(a) <= 1 or b * math.log2(abs(a)) <= 53:
+                return a ** b
+
+        try:
+            return math.pow(a, b)
+        except ZeroDivisionError:
+            # 0 ** -n is Infinity
+            return math.inf
+        except ValueError:
+            # A negative number to a fractional power
+            return math.nan
+        except OverflowError:
+            return math.inf if a > 0 or float(b) % 2 == 0 else -math.inf
+
+    @staticmethod
+    def remainder(a, b):
+        """ Computes `a % b` as JavaScript does: the result takes the sign of
+        the dividend, and a remainder by 0 is NaN.
+        """
+        if isinstance(a, Interval) or isinstance(b, Interval):
+            return Interval.of(a) % b
+
+        if isinstance(a, int) and isinstance(b, int):
+            if b == 0:
+                return math.nan
+
+            ret = abs(a) % abs(b)
+            return ret if a >= 0 else -ret
+
+        try:
+            return math.fmod(a, b)
+        except ValueError:
+            # Infinity % n and n % 0
+            return math.nan
+
+    @staticmethod
+    def int32(value):
+        """ Converts the given number to a 32-bit integer (ToInt32).
+        """
+        if isinstance(value, Interval):
+            raise TypeError('shifts of ranges are not computed')
+
+        if isinstance(value, float):
+            if math.isnan(value) or math.isinf(value):
+                return 0
+            value = int(value)
+
+        value &= 0xffffffff
+        if value >= 0x80000000:
+            value -= 0x100000000
+
+        return value
+
+    @staticmethod
+    def leftShift(a, b):
+        return Arithmetic.int32(Arithmetic.int32(a) << (Arithmetic.int32(b) & 31))
+
+    @staticmethod
+    def rightShift(a, b):
+        return Arithmetic.int32(a) >> (Arithmetic.int32(b) & 31)
+
@@ -0,0 +1,201 @@
+# vim: ts=4:sw=4
+import operator
+
+import numpy
+
+from lib.values.interval import Interval
+
+
+class Columns:
+    """ The columnar (NumPy) form of a numeric Value.
+
+    Each possibility is a row: its kind as a small integer code, the bounds of
+    its number (equal for exact numbers), whether it is an integer and the
+    index of its condition. Operators then run over whole arrays instead of
+    one pair of possibilities at a time.
+
+    Only Values made up entirely of numbers have columns.
+    """
+
+    # Kind codes, ordered so the kind of a result is the larger code
+    KINDS = ('int', 'float', 'random',)
+    CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+    # Operators producing numbers
+    ARITHMETIC = (
+        operator.add, operator.sub, operator.mul, operator.truediv,
+    )
+
+    # Operators producing booleans
+    COMPARISON = (
+        operator.lt, operator.le, operator.gt, operator.ge, operator.eq, operator.ne,
+    )
+
+    def __init__(self, kinds, lows, highs, integral, conditions, condition_index, boolean=False):
+        self.kinds = kinds
+        self.lows = lows
+        self.highs = highs
+        self.integral = integral
+        self.conditions = conditions
+        self.condition_index = condition_index
+        self.boolean = boolean
+
+    @staticmethod
+    def of(value):
+        """ Builds the columns of the given Value, or None if it is not numeric.
+        """
+
+        count = len(value.values)
+        kinds = numpy.empty(count, dtype=numpy.int8)
+        lows = numpy.empty(count, dtype=numpy.float64)
+        highs = numpy.empty(count, dtype=numpy.float64)
+        integral = numpy.empty(count, dtype=bool)
+        condition_index = numpy.empty(count, dtype=numpy.int32)
+        conditions = []
+        indices = {}
+
+        for i, (kind, payload, condition) in enumerate(value.values):
+            code = Columns.CODES.get(kind)
+            if code is None or not isinstance(payload, (int, float, Interval,)):
+                return None
+
+            kinds[i] = code
+            if isinstance(payload, Interval):
+                lows[i] = payload.low
+                highs[i] = payload.high
+                integral[i] = isinstance(payload.low, int) and isinstance(payload.high, int)
+            else:
+                lows[i] = highs[i] = payload
+                integral[i] = isinstance(payload, int)
+
+            index = indices.get(id(condition))
+            if index is None:
+                index = indices[id(condition)] = len(conditions)
+                conditions.append(condition)
+            condition_index[i] = index
+
+        return Columns(kinds, lows, highs, integral, conditions, condition_index)
+
+    def supports(self, operation):
+        return operation in Columns.ARITHMETIC or operation in Columns.COMPARISON
+
+    def binary(self, b, operation):
+        """ Applies the operation to every pair of rows of this and `b`.
+
+        The result keeps the condition of our (left-hand) rows.
+        """
+
+        # Every pair as an (n, m) grid, then flattened
+        ll, lh = self.lows[:, None], self.highs[:, None]
+        rl, rh = b.lows[None, :], b.highs[None, :]
+        shape = (len(self.kinds), len(b.kinds),)
+
+        kinds = numpy.maximum(self.kinds[:, None], b.kinds[None, :])
+        integral = self.integral[:, None] & b.integral[None, :]
+        condition_index = numpy.broadcast_to(self.condition_index[:, None], shape)
+
+        boolean = operation in Columns.COMPARISON
+        if operation is operator.add:
+            lows, highs = ll + rl, lh + rh
+        elif operation is operator.sub:
+            lows, highs = ll - rh, lh - rl
+        elif operation is operator.mul:
+            with numpy.errstate(invalid='ignore'):
+                products = numpy.stack([ll * rl, ll * rh, lh * rl, lh * rh])
+            # 0 * Infinity only appears at the bounds and contributes 0
+            products = numpy.nan_to_num(products, nan=0.0, posinf=numpy.inf, neginf=-numpy.inf)
+            lows, highs = products.min(axis=0), products.max(axis=0)
+        elif operation is operator.truediv:
+            if ((b.lows <= 0) & (b.highs >= 0)).any():
+                # Division by a range containing zero: not worth it here
+                return None
+
+            # Division is monotonic when the divisor keeps its sign
+            quotients = numpy.stack([ll / rl, ll / rh, lh / rl, lh / rh])
+            lows, highs = quotients.min(axis=0), quotients.max(axis=0)
+            integral = numpy.zeros(shape, dtype=bool)
+        else:
+            # Comparisons: 1 when decided true, 0 when decided false, both
+            # bounds when it could go either way
+            if operation is operator.lt:
+                yes, no = lh < rl, ll >= rh
+            elif operation is operator.le:
+                yes, no = lh <= rl, ll > rh
+            elif operation is operator.gt:
+                yes, no = ll > rh, lh <= rl
+            elif operation is operator.ge:
+                yes, no = ll >= rh, lh < rl
+            else:
+                exact = (ll == lh) & (rl == rh) & (ll == rl)
+                disjoint = (lh < rl) | (rh < ll)
+                if operation is operator.eq:
+                    yes, no = exact, disjoint
+                else:
+                    yes, no = disjoint, exact
+
+            lows = numpy.where(no | ~yes, 0.0, 1.0)
+            highs = numpy.where(yes | ~no, 1.0, 0.0)
+            lows, highs = numpy.broadcast_to(lows, shape), numpy.broadcast_to(highs, shape)
+
+        return Columns(kinds.ravel(), numpy.broadcast_to(lows, shape).ravel(),
+                       numpy.broadcast_to(highs, shape).ravel(), integral.ravel(),
+                       self.conditions, condition_index.ravel(), boolean=boolean)
+
+    def unary(self, operation):
+        """ Applies negation or the unary plus to every row.
+        """
+
+        if operation is operator.neg:
+            return Columns(self.kinds, -self.highs, -self.lows, self.integral,
+                           self.conditions, self.condition_index)
+
+        if operation is operator.pos:
+            return self
+
+        return None
+
+    def unique(self):
+        """ Returns the rows without duplicates, in order of first appearance.
+        """
+
+        rows = numpy.stack([self.kinds, self.lows, self.highs, self.integral, self.condition_index], axis=1)
+        _, first = numpy.unique(rows, axis=0, return_index=True)
+        first.sort()
+
+        return Columns(self.kinds[first], self.lows[first], self.highs[first], self.integral[first],
+                       self.conditions, self.condition_index[first], boolean=self.boolean)
+
+    def widen(self):
+        """ Returns a single row covering all of the rows.
+        """
+
+        conditions = self.conditions
+        condition_index = self.condition_index[:1]
+        if (self.condition_index != self.condition_index[0]).any():
+            conditions = [None]
+            condition_index = numpy.zeros(1, dtype=numpy.int32)
+
+        return Columns(self.kinds.max(keepdims=True), self.lows.min(keepdims=True),
+                       self.highs.max(keepdims=True), self.integral.all(keepdims=True),
+                       conditions, condition_index, boolean=self.boolean)
+
+    def items(self):
+        """ Yields the rows as (kind, value, condition) possibilities.
+        """
+
+        for kind, low, high, integral, index in zip(self.kinds.tolist(), self.lows.tolist(), self.highs.tolist(),
+                                                    self.integral.tolist(), self.condition_index.tolist()):
+            if self.boolean:
+                low, high = bool(low), bool(high)
+            elif integral:
+                low, high = Columns._int(low), Columns._int(high)
+
+            value = low if low == high else Interval(low, high)
+            yield (Columns.KINDS[kind], value, self.conditions[index],)
+
+    @staticmethod
+    def _int(value):
+        # Only exactly representable integers go back to being ints
+        if value.is_integer() and abs(value) <= 2 ** 53:
+            return int(value)
+        return value
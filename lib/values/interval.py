@@ -0,0 +1,246 @@
+# vim: ts=4:sw=4
+import math
+
+
+class Interval:
+    """ Represents every number between `low` and `high` (inclusive).
+
+    Arithmetic follows interval arithmetic: the result of an operation covers
+    the result of that operation for any pair of numbers in its operands.
+    Comparisons yield a bool when they are decided for the whole range and
+    the boolean interval [False, True] when they are not.
+    """
+
+    def __init__(self, low, high):
+        if low > high:
+            raise ValueError(f'the interval [{low!r}, {high!r}] is empty')
+
+        self.low = low
+        self.high = high
+
+    @staticmethod
+    def of(value):
+        """ Returns the given number (or Interval) as an Interval.
+        """
+
+        if isinstance(value, Interval):
+            return value
+
+        return Interval(value, value)
+
+    @staticmethod
+    def collapse(value):
+        """ Returns a plain number if the given Interval holds a single value.
+        """
+
+        if isinstance(value, Interval) and value.low == value.high:
+            return value.low
+
+        return value
+
+    @staticmethod
+    def hull(values):
+        """ Returns the smallest Interval covering all of the given numbers and
+        Intervals.
+        """
+
+        ret = None
+        for value in values:
+            value = Interval.of(value)
+            if ret is None:
+                ret = value
+            else:
+                ret = Interval(min(ret.low, value.low), max(ret.high, value.high))
+
+        return ret
+
+    @staticmethod
+    def unknown():
+        """ The boolean interval: a comparison that might go either way.
+        """
+
+        return Interval(False, True)
+
+    def contains(self, value):
+        return self.low <= value <= self.high
+
+    def truthy(self):
+        """ Returns True or False when every value in the interval is truthy or
+        falsy, respectively, and None when it could be either.
+        """
+
+        if not self.contains(0):
+            return True
+
+        if self.low == self.high:
+            return False
+
+        return None
+
+    @staticmethod
+    def _mul(a, b):
+        # 0 * Infinity only appears at the bounds and contributes 0
+        if (a == 0 and math.isinf(b)) or (b == 0 and math.isinf(a)):
+            return 0.0
+        return a * b
+
+    def __add__(self, b):
+        b = Interval.of(b)
+        return Interval(self.low + b.low, self.high + b.high)
+
+    def __radd__(self, a):
+        return Interval.of(a) + self
+
+    def __sub__(self, b):
+        b = Interval.of(b)
+        return Interval(self.low - b.high, self.high - b.low)
+
+    def __rsub__(self, a):
+        return Interval.of(a) - self
+
+    def __mul__(self, b):
+        b = Interval.of(b)
+        products = [
+            Interval._mul(self.low, b.low), Interval._mul(self.low, b.high),
+            Interval._mul(self.high, b.low), Interval._mul(self.high, b.high),
+        ]
+        return Interval(min(products), max(products))
+
+    def __rmul__(self, a):
+        return Interval.of(a) * self
+
+    def __truediv__(self, b):
+        b = Interval.of(b)
+        if b.low < 0 < b.high or b.low == b.high == 0:
+            # Divisors close to 0 of either sign
+            return Interval(-math.inf, math.inf)
+
+        # Division is monotonic when the divisor keeps its sign, so the
+        # quotients of the bounds are exact bounds (and not rounded inward)
+        quotients = []
+        for divisor in [b.low, b.high]:
+            if divisor != 0:
+                quotients.extend([self.low / divisor, self.high / divisor])
+
+        if b.contains(0):
+            # Divisors tending to 0 from the one side they are on
+            positive = b.high > 0
+            if self.high > 0:
+                quotients.append(math.inf if positive else -math.inf)
+            if self.low < 0:
+                quotients.append(-math.inf if positive else math.inf)
+
+        return Interval(min(quotients), max(quotients))
+
+    def __rtruediv__(self, a):
+        return Interval.of(a) / self
+
+    def __floordiv__(self, b):
+        ret = self / b
+        return Interval(math.floor(ret.low) if math.isfinite(ret.low) else ret.low,
+                        math.floor(ret.high) if math.isfinite(ret.high) else ret.high)
+
+    def __rfloordiv__(self, a):
+        return Interval.of(a) // self
+
+    def __mod__(self, b):
+        # The remainder takes the sign of the dividend and is smaller than the
+        # divisor in magnitude.
+        b = Interval.of(b)
+        if b.contains(0):
+            # A remainder by 0 is NaN, which no Interval holds
+            raise ZeroDivisionError('remainder by a range containing 0')
+        limit = max(abs(b.low), abs(b.high))
+        if self.low >= 0:
+            return Interval(0, min(self.high, limit))
+        if self.high <= 0:
+            return Interval(max(self.low, -limit), 0)
+        return Interval(max(self.low, -limit), min(self.high, limit))
+
+    def __rmod__(self, a):
+        return Interval.of(a) % self
+
+    def __pow__(self, b):
+        b = Interval.of(b)
+
+        corners = []
+        if self.low > 0:
+            # x ** y is monotonic in both x and y for positive x
+            for x in [self.low, self.high]:
+                for y in [b.low, b.high]:
+                    corners.append(Interval._pow(x, y))
+        elif b.low == b.high and float(b.low).is_integer():
+            if b.low < 0 and self.contains(0):
+                # Dividing by powers of numbers close to 0 (of either sign)
+                return Interval(-math.inf, math.inf)
+
+            # An integer exponent
+            for x in [self.low, self.high]:
+                corners.append(Interval._pow(x, b.low))
+            if self.contains(0):
+                corners.append(Interval._pow(0, b.low))
+        else:
+            return Interval(-math.inf, math.inf)
+
+        return Interval(min(corners), max(corners))
+
+    def __rpow__(self, a):
+        return Interval.of(a) ** self
+
+    @staticmethod
+    def _pow(x, y):
+        try:
+            return math.pow(x, y)
+        except (ValueError, ZeroDivisionError):
+            # 0 ** -n is Infinity
+            return math.inf
+        except OverflowError:
+            return math.inf if x > 0 or float(y) % 2 == 0 else -math.inf
+
+    def __neg__(self):
+        return Interval(-self.high, -self.low)
+
+    def __pos__(self):
+        return self
+
+    def __lt__(self, b):
+        b = Interval.of(b)
+        if self.high < b.low:
+            return True
+        if self.low >= b.high:
+            return False
+        return Interval.unknown()
+
+    def __le__(self, b):
+        b = Interval.of(b)
+        if self.high <= b.low:
+            return True
+        if self.low > b.high:
+            return False
+        return Interval.unknown()
+
+    def __gt__(self, b):
+        return Interval.of(b) < self
+
+    def __ge__(self, b):
+        return Interval.of(b) <= self
+
+    def __eq__(self, b):
+        b = Interval.of(b)
+        if self.low == self.high == b.low == b.high:
+            return True
+        if self.high < b.low or b.high < self.low:
+            return False
+        return Interval.unknown()
+
+    def __ne__(self, b):
+        ret = self == b
+        if isinstance(ret, Interval):
+            return ret
+        return not ret
+
+    def __hash__(self):
+        return hash((self.low, self.high,))
+
+    def __repr__(self):
+        return f'[{self.low!r}, {self.high!r}]'
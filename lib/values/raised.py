@@ -1,6 +1,11 @@
 # vim: ts=4:sw=4
 class Raised():
+    __slots__ = ('exception', 'message', 'condition', 'occurrences',)
+
     def __init__(self, exception, message, condition):
         self.exception = exception
         self.message = message
         self.condition = condition
+
+        # How many times it happens (see Diagnostics)
+        self.occurrences = 0
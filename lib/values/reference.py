@@ -1,14 +1,52 @@
 # vim: ts=4:sw=4
+from lib.nodes.structural_node import StructuralNode
+
 
 class Reference:
-    """ Represents a class instance within the code.
+    """ Represents the instances of a class created at one allocation site.
+
+    Every instance created by the same call site (in the same calling
+    context, see Analyzer) is the same Reference, as is every instance
+    created by calls sharing a summary, so a program has only so many of them
+    however often it creates objects. Once a Reference stands
+    for more than one instance, writing to its properties cannot replace
+    what the others hold (see weak()).
     """
 
+    __slots__ = ('node', 'parent', 'methods', 'properties', 'allocations', 'receiver',)
+
     def __init__(self, node, base_class, annotation=None):
+        self.node = node
         self.parent = base_class
 
-        self.methods = {}
-        self.properties = {}
+        self.methods = StructuralNode.EMPTY
+        self.properties = StructuralNode.EMPTY
+
+        # How many times it was allocated and its 'this' within its methods
+        self.allocations = 0
+        self.receiver = None
+
+    def allocate(self):
+        """ Notes another instance allocated at the site of this Reference.
+        """
+        self.allocations += 1
+
+    def weak(self):
+        """ Determines if this Reference stands for more than one instance.
+        """
+        return self.allocations > 1
+
+    def this(self):
+        """ Returns the variable holding this Reference as 'this'.
+        """
+        from lib.nodes.variable_node import VariableNode
+        from lib.values.value import Value
+
+        if self.receiver is None:
+            self.receiver = VariableNode(self.node, None, annotation=None)
+            self.receiver.set_value(Value(self.node, 'reference', self).intern())
+
+        return self.receiver
 
     def lookup(self, name, recurse=True):
         """ Looks up the given name and returns the information block for it.
@@ -27,11 +65,14 @@ class Reference:
         return self.parent.lookup(name, recurse=recurse)
 
     def add_call(self, name, node, condition=None):
-        from lib.analysis.method import Method
-        self.methods[name] = self.methods.get(name, Method(self.node, self))
-        self.methods[name].add_call(node, condition)
+        # Calls are counted by the method of the class
+        method = self.parent.methods.get(name)
+        if method is not None:
+            self.parent._thaw(method).add_call(node, condition=condition)
 
     def add_property(self, name, prop):
+        if self.properties is StructuralNode.EMPTY:
+            self.properties = {}
         if name not in self.properties:
             self.properties[name] = prop
 
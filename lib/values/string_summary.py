@@ -0,0 +1,113 @@
+# vim: ts=4:sw=4
+from lib.values.interval import Interval
+
+
+class StringSummary:
+    """ Represents any string starting with `prefix` whose length is `length`
+    (a number or an Interval).
+
+    Strings longer than MAX_LENGTH are summarized this way, so building ever
+    longer strings (say, within a loop) costs the same at every step.
+    Concatenation keeps the prefix and adds up lengths. Comparisons are only
+    decided when the prefix or the length tells them apart.
+    """
+
+    # Strings longer than this are summarized
+    MAX_LENGTH = 4096
+
+    # How much of the start of a string a summary keeps
+    PREFIX = 64
+
+    def __init__(self, prefix, length):
+        self.prefix = prefix[:StringSummary.PREFIX]
+        self.length = Interval.collapse(length)
+
+    @staticmethod
+    def concat(a, b):
+        """ Concatenates two strings (or summaries), summarizing the result if
+        it would be too long.
+        """
+        if isinstance(a, str) and isinstance(b, str):
+            if len(a) + len(b) <= StringSummary.MAX_LENGTH:
+                return a + b
+
+        prefix = StringSummary.prefixOf(a)
+        if len(prefix) < StringSummary.PREFIX and isinstance(a, str):
+            prefix += StringSummary.prefixOf(b)
+
+        return StringSummary(prefix, StringSummary.lengthOf(a) + StringSummary.lengthOf(b))
+
+    @staticmethod
+    def prefixOf(value):
+        if isinstance(value, StringSummary):
+            return value.prefix
+
+        return value[:StringSummary.PREFIX]
+
+    @staticmethod
+    def lengthOf(value):
+        if isinstance(value, StringSummary):
+            return Interval.of(value.length)
+
+        return Interval.of(len(value))
+
+    def key(self):
+        """ Returns a hashable description of this summary.
+        """
+        length = Interval.of(self.length)
+        return (self.prefix, length.low, length.high,)
+
+    def __add__(self, b):
+        if not isinstance(b, (str, StringSummary,)):
+            return NotImplemented
+
+        return StringSummary.concat(self, b)
+
+    def __radd__(self, a):
+        if not isinstance(a, (str, StringSummary,)):
+            return NotImplemented
+
+        return StringSummary.concat(a, self)
+
+    def __bool__(self):
+        # Only long strings are summarized, and those are never empty
+        return True
+
+    def __eq__(self, b):
+        if not isinstance(b, (str, StringSummary,)):
+            return False
+
+        # Decided when the lengths or the prefixes cannot match
+        if (StringSummary.lengthOf(self) == StringSummary.lengthOf(b)) is False:
+            return False
+
+        a_prefix = self.prefix
+        b_prefix = StringSummary.prefixOf(b)
+        common = min(len(a_prefix), len(b_prefix))
+        if a_prefix[:common] != b_prefix[:common]:
+            return False
+
+        return Interval.unknown()
+
+    def __ne__(self, b):
+        ret = self == b
+        if isinstance(ret, Interval):
+            return ret
+        return not ret
+
+    def _order(self, b):
+        if not isinstance(b, (str, StringSummary,)):
+            raise TypeError('strings are only ordered among strings')
+
+        return Interval.unknown()
+
+    __lt__ = _order
+    __le__ = _order
+    __gt__ = _order
+    __ge__ = _order
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f'{self.prefix!r}... ({self.length!r} characters)'
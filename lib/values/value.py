@@ -1,33 +1,356 @@
 # vim: ts=4:sw=4
 import math
+import operator
+import weakref
 
 
+from lib.analysis.compiler import Compiler
+from lib.analysis.walker import Walker
 from lib.nodes.structural_node import StructuralNode
 from lib.nodes.variable_node import VariableNode
 
+from lib.values.arithmetic import Arithmetic
+from lib.values.columns import Columns
+from lib.values.interval import Interval
 from lib.values.reference import Reference
 from lib.values.raised import Raised
+from lib.values.string_summary import StringSummary
 
 
 class Value:
     """ Represents the abstract (or exact) value of some expression.
 
-    It might be a set of possibilities.
+    It might be a set of possibilities. Possibilities are kept free of
+    duplicates and, past MAX_POSSIBILITIES, are widened into ranges (numbers)
+    or a 'variant' (everything else) so the set stays bounded.
+
+    A Value is built up with add() and then interned: interned Values are
+    immutable, hash in constant time and are shared by every identical Value,
+    so two interned Values are equal exactly when they are the same object.
     """
 
+    __slots__ = (
+        'node', 'values', 'keys', 'interned', '_columns',
+        '_kinds', '_truth', '_types', '__weakref__',
+    )
+
+    # Interned Values by their key
+    INTERNED = weakref.WeakValueDictionary()
+
+    # The number of possibilities a Value holds before it is widened.
+    MAX_POSSIBILITIES = 32
+
+    # Kinds whose possibilities widen into a numeric range.
+    NUMERIC = ('int', 'float', 'random',)
+
+    # Kinds that are never widened: they are bounded by the program itself.
+    DISTINCT = ('reference', 'raised',)
+
+    # A bit for each kind of possibility (see _note()), assigned as kinds appear
+    KIND_BITS = {'raised': 1, 'variant': 2, 'reference': 4}
+
+    # Whether every possibility is surely truthy or surely falsy (see _note())
+    SURELY_TRUE = 1
+    SURELY_FALSE = 2
+
+    # The number of pairs of possibilities at which binary operations on
+    # numbers are computed over NumPy columns instead of pair by pair.
+    VECTORIZE = 256
+
+    # The operation each JavaScript operator performs on Values
+    BINARY_OPERATORS = {
+        '+': operator.add,
+        '-': operator.sub,
+        '*': operator.mul,
+        '/': operator.truediv,
+        '%': operator.mod,
+        '**': operator.pow,
+        '<<': operator.lshift,
+        '>>': operator.rshift,
+        '<': operator.lt,
+        '>': operator.gt,
+        # Compared possibility by possibility (Values themselves are only ever
+        # equal to themselves, see __eq__)
+        '==': lambda a, b: a.performBinaryOperation(b, operator.eq),
+        # TODO: this is a bit more special than this
+        '===': lambda a, b: a.performBinaryOperation(b, operator.eq),
+        '!=': lambda a, b: a.performBinaryOperation(b, operator.ne),
+        '>=': operator.ge,
+        '<=': operator.le,
+    }
+
+    UNARY_OPERATORS = {
+        '-': operator.neg,
+        '+': operator.pos,
+    }
+
+    # Compound assignments (+=, etc) and the operation they perform
+    ASSIGNMENT_OPERATORS = {
+        '+=': operator.add,
+        '-=': operator.sub,
+        '*=': operator.mul,
+        '/=': operator.truediv,
+        '%=': operator.mod,
+        '**=': operator.pow,
+        '>>=': operator.rshift,
+        '<<=': operator.lshift,
+    }
+
     def __init__(self, node, kind=None, value=None, condition=None):
         """ Construct a Value object with the given initial kind and value.
 
-        The initial `value` can be a tuple to depict a range of possible values.
+        The initial `value` can be an Interval to depict a range of possible values.
         """
 
         self.node = node
         self.values = []
+        self.keys = set()
+        self.interned = False
+        self._columns = False
+        self._reset()
         if kind is not None:
-            self.values = [(kind, value, condition,)]
+            self.add(kind, value, condition)
+
+    def _reset(self):
+        """ Empties the summary of the possibilities (see _note()).
+        """
+        self._kinds = 0
+        self._truth = Value.SURELY_TRUE | Value.SURELY_FALSE
+        self._types = ()
+
+    def _note(self, kind, value):
+        """ Updates the summary of the possibilities with a new one.
+
+        The summary holds the kinds, the truthiness and the types of every
+        possibility so far, so none of the queries on it (raised(), true(),
+        false(), type()) have to look at the possibilities themselves.
+        """
+        bit = Value.KIND_BITS.get(kind)
+        if bit is None:
+            bit = 1 << len(Value.KIND_BITS)
+            Value.KIND_BITS[kind] = bit
+        self._kinds |= bit
+
+        if self._truth:
+            if kind == 'raised':
+                self._truth &= ~Value.SURELY_TRUE
+            elif kind == 'variant':
+                self._truth = 0
+            else:
+                truthy = Value.truthy(value)
+                if truthy is not True:
+                    self._truth &= ~Value.SURELY_TRUE
+                if truthy is not False:
+                    self._truth &= ~Value.SURELY_FALSE
+
+        type = kind
+        if kind == 'reference':
+            type = f'@{value.parent.node.id.name}'
+
+        if type not in self._types:
+            self._types += (type,)
+
+    def intern(self):
+        """ Returns the shared, immutable instance of this Value.
+        """
+
+        if self.interned:
+            return self
+
+        key = self.key()
+        ret = Value.INTERNED.get(key)
+        if ret is not None:
+            return ret
+
+        self.values = tuple(self.values)
+        self.keys = None
+        self.interned = True
+        Value.INTERNED[key] = self
+        return self
+
+    @staticmethod
+    def itemKey(kind, value, condition):
+        """ Returns a hashable key for a single possibility.
+        """
+
+        if isinstance(value, Interval):
+            value = (value.low, value.high,)
+        elif isinstance(value, StringSummary):
+            value = value.key()
+        elif isinstance(value, (Reference, Raised,)):
+            value = id(value)
+
+        return (kind, type(value).__name__, value, id(condition) if condition is not None else None,)
+
+    def key(self):
+        """ Returns a hashable description of the possibilities of this Value.
+
+        Values with the same key describe the same set of possibilities.
+        Objects (references, raised exceptions and conditions) are compared by
+        identity.
+        """
+
+        return tuple(Value.itemKey(*value_item) for value_item in self.values)
+
+    def add(self, kind, value, condition=None):
+        """ Adds the given possibility unless it is already present.
+        """
+
+        if self.interned:
+            raise TypeError("interned Values cannot be changed")
+
+        key = Value.itemKey(kind, value, condition)
+        if key not in self.keys:
+            self.keys.add(key)
+            self.values.append((kind, value, condition,))
+            self._columns = False
+            self._note(kind, value)
+
+    def columns(self):
+        """ Returns the columnar form of this Value, or None if it is not
+        entirely numeric.
+        """
+
+        if self._columns is False:
+            self._columns = Columns.of(self)
+
+        return self._columns
+
+    @staticmethod
+    def fromColumns(node, columns):
+        """ Creates a Value out of the given (possibly duplicated) columns.
+        """
+
+        columns = columns.unique()
+        if len(columns.kinds) > Value.MAX_POSSIBILITIES:
+            columns = columns.widen()
+
+        ret = Value(node)
+        for value_item in columns.items():
+            ret.add(*value_item)
+
+        return ret.intern()
+
+    def bound(self, limit=None):
+        """ Widens this Value, in place, to at most `limit` possibilities.
+
+        Numbers are merged into a single range covering all of them and any
+        other primitive becomes a 'variant'. References and raised exceptions
+        are kept as they are. The result always covers the original set.
+        """
+
+        if limit is None:
+            limit = Value.MAX_POSSIBILITIES
 
-    def __hash__(self):
-        return str(self).__hash__()
+        if len(self.values) <= limit:
+            return self
+
+        if self.interned:
+            raise TypeError("interned Values cannot be changed")
+
+        values = self.values
+        self.values = []
+        self.keys = set()
+        self._columns = False
+        self._reset()
+
+        numbers = []
+        kinds = set()
+        conditions = set()
+        for kind, value, condition in values:
+            if kind in Value.DISTINCT:
+                self.add(kind, value, condition)
+            elif kind in Value.NUMERIC and isinstance(value, (int, float, Interval,)):
+                numbers.append(value)
+                kinds.add(kind)
+                conditions.add(id(condition))
+            else:
+                self.add('variant', None, None)
+
+        if numbers:
+            # 'random' over 'float' over 'int'
+            kind = max(kinds, key=Value.NUMERIC.index)
+            condition = None
+            if len(conditions) == 1:
+                # Every possibility shared the same condition
+                condition = next(value_item[2] for value_item in values if value_item[0] in Value.NUMERIC)
+            self.add(kind, Interval.hull(numbers), condition)
+
+        return self
+
+    @staticmethod
+    def join(node, a, b):
+        """ Returns the Value holding the possibilities of both given Values.
+
+        Either may be None (not assigned), in which case the other is returned.
+        """
+
+        if a is None:
+            return b
+
+        if b is None or a is b:
+            return a
+
+        ret = Value(node)
+        for value_item in a.values:
+            ret.add(*value_item)
+        for value_item in b.values:
+            ret.add(*value_item)
+
+        return ret.bound().intern()
+
+    @staticmethod
+    def widen(node, before, after):
+        """ Returns a Value covering `after` which stops growing past `before`.
+
+        Numbers are merged into a single range whose bounds jump to infinity in
+        any direction they grew since `before`. Anything else that grew becomes
+        a 'variant'. Widening repeatedly therefore reaches a fixed point after
+        a few steps.
+        """
+
+        if before is None or after is None or after is before:
+            return after
+
+        known = set(Value.itemKey(*value_item) for value_item in before.values)
+
+        ret = Value(node)
+        numbers = []
+        kinds = set()
+        for kind, value, condition in after.values:
+            if kind in Value.NUMERIC and isinstance(value, (int, float, Interval,)):
+                numbers.append(value)
+                kinds.add(kind)
+            elif Value.itemKey(kind, value, condition) in known:
+                ret.add(kind, value, condition)
+            else:
+                ret.add('variant', None, None)
+
+        if numbers:
+            # 'random' over 'float' over 'int'
+            kind = max(kinds, key=Value.NUMERIC.index)
+            hull = Interval.hull(numbers)
+
+            previous = [value for value_kind, value, _ in before.values
+                        if value_kind in Value.NUMERIC and isinstance(value, (int, float, Interval,))]
+            if previous:
+                bounds = Interval.hull(previous)
+                hull = Interval(bounds.low if hull.low >= bounds.low else -math.inf,
+                                bounds.high if hull.high <= bounds.high else math.inf)
+
+            ret.add(kind, Interval.collapse(hull), None)
+
+        return ret.intern()
+
+    @staticmethod
+    def raises(node, ast, context, exception, message):
+        """ Notes that evaluating the given node raises and returns that Value.
+        """
+
+        # Each raise is recorded once, but counted every time it happens
+        raised = ast.diagnostics.record(context, node, exception, message, context.condition)
+        ast._effect(ast.diagnostics.occur, raised)
+        return Value(node, kind='raised', value=raised, condition=context.condition).intern()
 
     @staticmethod
     def combine(node, values, halt_if_true=False):
@@ -51,13 +374,18 @@ class Value:
 
         ret = Value(node)
         for value in values:
+            certain = True
             for value_item in value.values:
-                ret.values.append(value_item)
+                ret.add(*value_item)
                 condition = value_item[2]
-                if halt_if_true and (condition is None or condition.true()):
-                    return Value.influence(ret_type, ret)
+                if not (condition is None or condition.true()):
+                    certain = False
 
-        return Value.influence(ret_type, ret)
+            # A value that is surely reached hides everything after it
+            if halt_if_true and certain and value.values:
+                break
+
+        return Value.influence(ret_type, ret.bound()).intern()
 
     @staticmethod
     def influence(new_type, value):
@@ -82,12 +410,12 @@ class Value:
                 coerced_type = new_type
 
                 # If the current value is not a range, then make it one.
-                if not isinstance(old_value, list):
-                    old_value = [0.0, 1.0]
+                if not isinstance(old_value, Interval):
+                    old_value = Interval(0.0, 1.0)
 
-            ret.values.append((coerced_type, old_value, value_item[2],))
+            ret.add(coerced_type, old_value, value_item[2])
 
-        return ret
+        return ret.intern()
 
     @staticmethod
     def coerce(new_type, value):
@@ -104,62 +432,60 @@ class Value:
             if new_type == 'random':
                 coerced_type = new_type
 
-            ret.values.append((coerced_type, value_item[1], value_item[2],))
+            ret.add(coerced_type, value_item[1], value_item[2])
 
-        return ret
+        return ret.intern()
 
     def type(self):
         """ Get a collection of possible types this variable contains.
         """
 
-        ret = []
-
-        for value in self.values:
-            type = value[0]
-            if type == 'reference':
-                classname = value[1].parent.node.id.name
-                type = f'@{classname}'
-
-            if type not in ret:
-                ret.append(type)
-
-        return ret
+        return list(self._types)
 
     def raised(self):
         """ Determines if this expression always raises.
         """
-        is_raised = len(self.values) > 0
-        for value in self.values:
-            # If any value is non-raised, we return False
-            if value[0] != 'raised':
-                is_raised = False
-                break
 
-        return is_raised
+        # There are possibilities and all of them raise
+        return self._kinds == Value.KIND_BITS['raised']
+
+    @staticmethod
+    def truthy(value):
+        """ Returns True or False when the given payload is always truthy or
+        always falsy, respectively, and None when it may be either.
+        """
+        if isinstance(value, Interval):
+            return value.truthy()
+
+        return bool(value)
 
     def false(self):
         """ Determines if this Value is always Falsey.
         """
-        is_false = True
-        for value in self.values:
-            # If any non-raised value is truthy, we return False
-            if value[1] and value[0] != 'raised':
-                is_false = False
-                break
 
-        return is_false
+        # Raised possibilities are never reached, so they do not count
+        return bool(self._truth & Value.SURELY_FALSE)
 
     def true(self):
         """ Determines if this Value is always Truthy.
         """
-        is_true = True
-        for value in self.values:
-            # If it possibly raises or any value is falsey, we return False
-            if value[0] == 'raised' or not value[1]:
-                is_true = False
-                break
 
-        return is_true
+        # Any possibility that raises (or might be falsey) makes this False
+        return bool(self._truth & Value.SURELY_TRUE)
+
+    def negate(self):
+        """ Returns the Value that is truthy exactly where this one is falsy.
+        """
+        ret = Value(self.node)
+        for kind, value, condition in self.values:
+            if kind == 'raised':
+                ret.add(kind, value, condition)
+                continue
+
+            truthy = None if kind == 'variant' else Value.truthy(value)
+            ret.add('bool', Interval.unknown() if truthy is None else not truthy, condition)
+
+        return ret.bound().intern()
 
     def performBinaryOperation(self, b, operation):
         # Take all possible values and reflect what happens when we add the
@@ -167,6 +493,15 @@ class Value:
 
         # Any raised values propagate
 
+        # Large sets of numbers are done all at once
+        if len(self.values) * len(b.values) >= Value.VECTORIZE:
+            left = self.columns()
+            right = b.columns()
+            if left is not None and right is not None and left.supports(operation):
+                columns = left.binary(right, operation)
+                if columns is not None:
+                    return Value.fromColumns(self.node, columns)
+
         ret = Value(self.node)
         for lh in self.values:
             lh_type = lh[0]
@@ -189,6 +524,8 @@ class Value:
                     new_type = 'raised'
                 elif lh_type == 'variant':
                     new_type = rh_type
+                elif lh_type == 'random' or rh_type == 'random':
+                    new_type = 'random'
                 elif lh_type == 'float' or rh_type == 'float':
                     new_type = 'float'
                 elif lh_type == 'bool' and rh_type != 'bool':
@@ -197,7 +534,10 @@ class Value:
                 # Coerce values
 
                 # Any float in the equation becomes a float
-                if new_type == 'float' and new_type != lh_type:
+                # (Ranges are already numbers of either sort)
+                if isinstance(l, Interval):
+                    pass
+                elif new_type == 'float' and new_type != lh_type:
                     if lh_type == 'variant':
                         l = 0.0
                     l = float(l)
@@ -207,7 +547,9 @@ class Value:
                     l = int(l)
 
                 # Any float in the equation becomes a float
-                if new_type == 'float' and new_type != rh_type:
+                if isinstance(r, Interval):
+                    pass
+                elif new_type == 'float' and new_type != rh_type:
                     if rh_type == 'variant':
                         r = 0.0
                     r = float(r)
@@ -218,93 +560,94 @@ class Value:
 
                 new_value = l
                 if new_type != 'variant' and new_type != 'raised':
-                    if isinstance(l, list):
-                        # Two dimensional set of values
-                        if isinstance(r, list):
-                            pass
-                        else:
-                            new_value = list(map(lambda x: operation(x, r), l))
-
-                            # Range has collapsed into a single value
-                            if new_value[0] == new_value[1]:
-                                new_value = new_value[0]
-                    elif isinstance(r, list):
-                        # Two dimensional set of values
-                        if isinstance(l, list):
-                            pass
-                        else:
-                            new_value = list(map(lambda x: operation(l, x), r))
-                            # Range has collapsed into a single value
-                            if new_value[0] == new_value[1]:
-                                new_value = new_value[0]
-                    else:
-                        new_value = operation(l, r)
-
-                ret.values.append((new_type, new_value, lh[2],))
-        return ret
+                    try:
+                        # Ranges apply interval arithmetic and collapse back
+                        # into a single value when they can
+                        new_value = Interval.collapse(Arithmetic.apply(operation, l, r))
+                    except (TypeError, ValueError, ArithmeticError):
+                        # Not something we can determine
+                        new_type = 'variant'
+                        new_value = None
+
+                ret.add(new_type, new_value, lh[2])
+        return ret.bound().intern()
 
     def performUnaryOperation(self, operation):
         # Take all possible values and reflect what happens when we add the
         # given value to it.
+        if len(self.values) >= Value.VECTORIZE:
+            columns = self.columns()
+            if columns is not None:
+                columns = columns.unary(operation)
+                if columns is not None:
+                    return Value.fromColumns(self.node, columns)
+
         ret = Value(self.node)
         for lh in self.values:
             # Determine new type
-            ret.values.append((lh[0], operation(lh[1]), lh[2],))
-        return ret
+            if lh[0] == 'raised' or lh[0] == 'variant':
+                ret.add(*lh)
+                continue
+
+            try:
+                ret.add(lh[0], operation(lh[1]), lh[2])
+            except (TypeError, ValueError, ArithmeticError):
+                ret.add('variant', None, lh[2])
+        return ret.bound().intern()
 
     def __add__(self, b):
         """ Adds two Value objects together.
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a + b)
+        return self.performBinaryOperation(b, operator.add)
 
     def __sub__(self, b):
         """ Subtracts one Value object from another.
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a - b)
+        return self.performBinaryOperation(b, operator.sub)
 
     def __mul__(self, b):
         """ Multiplies two Value objects together.
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a * b)
+        return self.performBinaryOperation(b, operator.mul)
 
     def __truediv__(self, b):
         """ Divides two Value objects.
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a / b)
+        return self.performBinaryOperation(b, operator.truediv)
 
     def __floordiv__(self, b):
         """ Divides two Value objects (flooring the result).
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a // b)
+        return self.performBinaryOperation(b, operator.floordiv)
 
     def __mod__(self, b):
         """ Yields the remainder from division.
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a % b)
+        return self.performBinaryOperation(b, operator.mod)
 
     def __pow__(self, b):
         """ Raises one Value to another
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a ** b)
+        return self.performBinaryOperation(b, operator.pow)
 
     def __rshift__(self, b):
         """ Performs a binary right shift.
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a >> b)
+        return self.performBinaryOperation(b, operator.rshift)
 
     def __lshift__(self, b):
         """ Performs a binary left shift.
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a << b)
+        return self.performBinaryOperation(b, operator.lshift)
 
     def __and__(self, b):
         """ Performs a logical 'and' of the two Value objects.
@@ -322,254 +665,349 @@ class Value:
         """ Performs a bitwise 'xor' of the two Value objects.
         """
 
-        return self.performBinaryOperation(b, lambda a, b: a ^ b)
+        return self.performBinaryOperation(b, operator.xor)
 
     def __not__(self):
-        return self.performUnaryOperation(lambda a: not a)
+        return self.negate()
 
     def __neg__(self):
-        return self.performUnaryOperation(lambda a: -a)
+        return self.performUnaryOperation(operator.neg)
 
     def __pos__(self):
-        return self.performUnaryOperation(lambda a: +a)
+        return self.performUnaryOperation(operator.pos)
 
     def __invert__(self):
-        return self.performUnaryOperation(lambda a: ~a)
+        return self.performUnaryOperation(operator.invert)
 
     def __lt__(self, b):
-        return self.performBinaryOperation(b, lambda a, b: a < b)
+        return self.performBinaryOperation(b, operator.lt)
 
     def __gt__(self, b):
-        return self.performBinaryOperation(b, lambda a, b: a > b)
+        return self.performBinaryOperation(b, operator.gt)
 
     def __le__(self, b):
-        return self.performBinaryOperation(b, lambda a, b: a <= b)
+        return self.performBinaryOperation(b, operator.le)
 
     def __ge__(self, b):
-        return self.performBinaryOperation(b, lambda a, b: a >= b)
+        return self.performBinaryOperation(b, operator.ge)
 
     def __eq__(self, b):
-        return self.performBinaryOperation(b, lambda a, b: a == b)
+        # Interned Values are equal exactly when they are the same object. The
+        # JavaScript == is in BINARY_OPERATORS.
+        return self is b
 
     def __ne__(self, b):
-        return self.performBinaryOperation(b, lambda a, b: a != b)
+        return self is not b
+
+    __hash__ = object.__hash__
 
     @staticmethod
     def valueOf(node, text, ast, context=None, base=None):
         """ Determine the value of the given subtree rooted at the given node.
         """
 
-        from lib.nodes.property_node import PropertyNode
+        return Walker(ast, text, ast.ast).walk('value', node, context)
 
-        if base is None:
-            base = node
+    @staticmethod
+    @Walker.compiles('value')
+    def _compile(node):
+        return Compiler.compiled(node)
 
-        # TODO: return a complex type (Value?) that holds the value and the
-        # type of the expression. Perhaps, a range of possible values.
-        if node.type == "BlockStatement":
-            # TODO: move this to Block.valueOf
-            value = None
-            for subnode in node.body:
-                value = Value.valueOf(subnode, text, ast, context)
+    @staticmethod
+    @Walker.handles('value', None)
+    def _valueOfOther(walk, node, context):
+        return None
 
-            return value
+    @staticmethod
+    @Walker.exhausts('value')
+    def _valueOfExhausted(walk, node, context):
+        # Out of budget: it could be anything (and so could what it assigns)
+        walk.analyzer._forget(walk, node, context)
+        return Value(node, 'variant', None, context.condition).intern()
 
-        if node.type == "Identifier":
-            # Lookup the Value currently representing the named identifier
-            variable = context.lookup(node.name)
-            if variable is None:
-                return None
-            return variable.get_value()
-
-        if node.type == "ExpressionStatement":
-            # Recursively determine the value of the expression
-            return Value.valueOf(node.expression, text, ast, context)
-        
-        if node.type == "AssignmentExpression":
-            # What is the left-hand side?
-            this = context
-            prop = None
-            if node.left.type == "MemberExpression":
-                # Look up reference
-                if node.left.object.type == "ThisExpression":
-                    this = context.lookup('this')
-                else:
-                    this = context.lookup(node.left.object.name)
-                prop = this.lookup(node.left.property.name)
+    @staticmethod
+    @Walker.handles('value', 'BlockStatement')
+    def _valueOfBlock(walk, node, context):
+        # TODO: move this to Block.valueOf
+        value = None
+        for subnode in node.body:
+            value = yield ('value', subnode, context)
+
+        return value
+
+    @staticmethod
+    @Walker.handles('value', 'Identifier')
+    def _valueOfIdentifier(walk, node, context):
+        # Lookup the Value currently representing the named identifier
+        variable = context.lookup(node.name)
+        if variable is None:
+            return None
+        walk.analyzer._load(variable)
+        return variable.get_value()
+
+    @staticmethod
+    @Walker.handles('value', 'ExpressionStatement')
+    def _valueOfStatement(walk, node, context):
+        # Recursively determine the value of the expression
+        return (yield ('value', node.expression, context))
+
+    @staticmethod
+    @Walker.handles('value', 'AssignmentExpression')
+    def _valueOfAssignment(walk, node, context):
+        from lib.nodes.property_node import PropertyNode
+
+        ast = walk.analyzer
+
+        # What is the left-hand side?
+        this = context
+        prop = None
+        if node.left.type == "MemberExpression":
+            # Look up reference
+            if node.left.object.type == "ThisExpression":
+                this = context.lookup('this')
             else:
-                # A normal variable
-                prop = context.lookup(node.left.name)
-
-            # We only care about the value of the right-hand side
-            value = Value.valueOf(node.right, text, ast, context)
-
-            # Is this also a mathematical operation? (+=, etc)
-            if node.operator == '+=':
-                value = prop.get_value() + value
-            elif node.operator == '-=':
-                value = prop.get_value() - value
-            elif node.operator == '*=':
-                value = prop.get_value() * value
-            elif node.operator == '/=':
-                value = prop.get_value() / value
-            elif node.operator == '%=':
-                value = prop.get_value() % value
-            elif node.operator == '>>=':
-                value = prop.get_value() >> value
-            elif node.operator == '<<=':
-                value = prop.get_value() << value
-
-            # Now, we want to set the variable state to that new value
-
-            # If the property does not exist, we must create it
-            if prop is None:
-                prop = VariableNode(node.left.property, this, annotation=[])
-                this.add_property(node.left.property.name, prop)
-
-            if isinstance(prop, PropertyNode):
-                prop = VariableNode(node.left.property, prop, annotation=[])
-                this.add_property(node.left.property.name, prop)
-
-            prop.set_value(value)
-
-            # The expression itself has the assigned value
-            return value
+                this = context.lookup(node.left.object.name)
+            prop = this.lookup(node.left.property.name)
+        else:
+            # A normal variable
+            prop = context.lookup(node.left.name)
+
+        # We only care about the value of the right-hand side
+        value = yield ('value', node.right, context)
+
+        # Is this also a mathematical operation? (+=, etc)
+        operation = Value.ASSIGNMENT_OPERATORS.get(node.operator)
+        if operation is not None:
+            value = operation(prop.get_value(), value)
+
+        if prop is not None and Value._weak(node.left, this):
+            # Other objects share the property, so they keep what they hold
+            value = Value.join(node, prop.get_value(), value)
+
+        # Now, we want to set the variable state to that new value
 
-        if node.type == "CallExpression":
-            # We then need to negotiate the function value
-            from lib.nodes.call_node import CallNode
-            from lib.nodes.class_node import ClassNode
-            from lib.nodes.function_node import FunctionNode
-
-            # First, determine the callee context
-
-            # Go through member listing, if it exists
-            this = None
-            body = None
-            if node.callee.type == "MemberExpression":
-                # Look up reference
-                this = context.lookup(node.callee.object.name)
-                if this is None:
-                    # Unknown reference
-                    # Always a runtime error while evaluating this expression
-                    raised = context.add_raises("ReferenceError", f'{node.callee.object.name} is not defined')
-                    return Value(node, kind='raised', value=raised, condition=context.condition)
-
-                callee = this.lookup(node.callee.property.name)
-                if callee is None:
-                    raised = context.add_raises('ReferenceError', f'{node.callee.object.name}.{node.callee.property.name} is not a function')
-                    return Value(node, kind='raised', value=raised, condition=context.condition)
-
-                # Add a reference to it being called in this context
-
-                # Is this a static method?
-                if not isinstance(callee, FunctionNode):
-                    # It is indeed an instance method
-                    this.add_call(node.callee.property.name, node, condition=context.condition)
+        # If the property does not exist, we must create it
+        if prop is None:
+            prop = VariableNode(node.left.property, this, annotation=[])
+            this.add_property(node.left.property.name, prop)
+
+        if isinstance(prop, PropertyNode):
+            prop = VariableNode(node.left.property, prop, annotation=[])
+            this.add_property(node.left.property.name, prop)
+
+        ast._assign(prop, value)
+        Value._stored(ast, node.left, this, prop)
+
+        # The expression itself has the assigned value
+        return value
+
+    @staticmethod
+    def _weak(target, this):
+        """ Determines if writing the given target may leave what it held in
+        place: when it is a property of an object standing for more than
+        one instance, or of one of several possible objects.
+        """
+        if target.type != "MemberExpression" or not isinstance(this, VariableNode) or not this.get_value():
+            return False
+
+        references = [value_item[1] for value_item in this.get_value().values if value_item[0] == 'reference']
+        return len(references) > 1 or any(reference.weak() for reference in references)
+
+    @staticmethod
+    def _stored(ast, target, this, prop):
+        """ Notes what was written (for function summaries).
+        """
+        if target.type == "MemberExpression" and isinstance(this, VariableNode) and this.get_value():
+            for value_item in this.get_value().values:
+                if value_item[0] == 'reference':
+                    ast._store(value_item[1])
+        else:
+            ast._store(prop)
+
+    @staticmethod
+    @Walker.handles('value', 'UpdateExpression')
+    def _valueOfUpdate(walk, node, context):
+        ast = walk.analyzer
+
+        # What is being incremented (or decremented)?
+        target = node.argument
+        this = context
+        if target.type == "MemberExpression":
+            if target.object.type == "ThisExpression":
+                this = context.lookup('this')
             else:
-                # A normal function
-                callee = context.lookup(node.callee.name)
-                if callee is None:
-                    raised = context.add_raises('ReferenceError', f'{node.callee.name} is not defined')
-                    return Value(node, kind='raised', value=raised, condition=context.condition)
-
-            # We want to determine if the function call is the constructor
-            constructing = False
-
-            # The constructor is essentially a call on the class itself
-            if isinstance(callee, ClassNode):
-                # Keep track of the possible instantiations within the current context
-                constructing = True
-
-                # Create an instanced context
-                base_class = callee
-                instance = Reference(node, base_class, base_class.annotation)
-
-                # Look up the possible constructor method
-                callee = base_class.lookup('constructor')
-
-                # Create a reference value
-                this = Value(node, kind='reference', value=instance, condition=context.condition)
-
-                # Make a note in the class annotation that an instance was created
-                # and the context within which it was created.
-                base_class.add_instance(context)
-
-                # If there is no constructor, we still return 'this'
-                # No need to go through the constructor
-                if callee is None:
-                    return this
-            elif isinstance(callee, FunctionNode):
-                # Normal function / static method call
-                callee.add_call(node.callee, condition=context.condition)
-
-                # Add instantiations this call makes
-                context.add_instantiations(callee.instantiates)
-
-            # Analysis of the possible values
-            value = CallNode(node).valueOf(callee, text, ast, context)
-
-            # If this is a constructor call, the value is always the reference
-            # and not any value returned by the function body of the constructor.
-            if constructing:
+                this = context.lookup(target.object.name)
+            prop = None if this is None else this.lookup(target.property.name)
+        else:
+            prop = context.lookup(target.name)
+
+        if prop is None or prop.get_value() is None:
+            return None
+
+        ast._load(prop)
+        old = prop.get_value()
+        one = Value(node, 'int', 1, context.condition).intern()
+        value = old + one if node.operator == '++' else old - one
+
+        if Value._weak(target, this):
+            # Other objects share the property, so they keep what they hold
+            value = Value.join(node, old, value)
+
+        ast._assign(prop, value)
+        Value._stored(ast, target, this, prop)
+
+        # ++i is the new value and i++ the old one
+        return value if node.prefix else old
+
+    @staticmethod
+    @Walker.handles('value', 'CallExpression')
+    def _valueOfCall(walk, node, context):
+        # We then need to negotiate the function value
+        from lib.nodes.call_node import CallNode
+        from lib.nodes.class_node import ClassNode
+        from lib.nodes.function_node import FunctionNode
+
+        ast = walk.analyzer
+
+        # First, determine the callee context
+
+        # Go through member listing, if it exists
+        this = None
+        if node.callee.type == "MemberExpression":
+            # Look up reference
+            this = context.lookup(node.callee.object.name)
+            if this is None:
+                # Unknown reference
+                # Always a runtime error while evaluating this expression
+                return Value.raises(node, ast, context, "ReferenceError", f'{node.callee.object.name} is not defined')
+
+            callee = this.lookup(node.callee.property.name)
+            if callee is None:
+                return Value.raises(node, ast, context, 'ReferenceError', f'{node.callee.object.name}.{node.callee.property.name} is not a function')
+
+            # Add a reference to it being called in this context
+
+            # Is this a static method?
+            if not isinstance(callee, FunctionNode):
+                # It is indeed an instance method
+                this.add_call(node.callee.property.name, node, condition=context.condition)
+        else:
+            # A normal function
+            callee = context.lookup(node.callee.name)
+            if callee is None:
+                return Value.raises(node, ast, context, 'ReferenceError', f'{node.callee.name} is not defined')
+
+        # We want to determine if the function call is the constructor
+        constructing = False
+
+        # The constructor is essentially a call on the class itself
+        if isinstance(callee, ClassNode):
+            # Keep track of the possible instantiations within the current context
+            constructing = True
+
+            # The object allocated here (shared by every instance allocated
+            # here within the same calling context)
+            base_class = callee
+            instance = ast._instance(node, base_class)
+
+            # Look up the possible constructor method
+            callee = base_class.lookup('constructor')
+
+            # Create a reference value
+            this = Value(node, kind='reference', value=instance, condition=context.condition).intern()
+
+            # Make a note in the class annotation that an instance was created
+            # and the context within which it was created.
+            ast._effect(base_class.add_instance, context)
+
+            # If there is no constructor, we still return 'this'
+            # No need to go through the constructor
+            if callee is None:
                 return this
+        elif isinstance(callee, FunctionNode):
+            # Normal function / static method call
+            callee.add_call(node.callee, condition=context.condition)
 
-            # Otherwise, we return the aggregate value
-            return value
+            # Add instantiations this call makes
+            instantiations = {klass: dict(info) for klass, info in callee.instantiates.items()}
+            ast._effect(context.add_instantiations, instantiations)
+
+        # Analysis of the possible values
+        if constructing:
+            value = yield from CallNode(node).valueOf(callee, walk, context, this=instance.this())
+        else:
+            value = yield from CallNode(node).valueOf(callee, walk, context)
+
+        # If this is a constructor call, the value is always the reference
+        # and not any value returned by the function body of the constructor.
+        if constructing:
+            return this
+
+        # Otherwise, we return the aggregate value
+        return value
+
+    @staticmethod
+    @Walker.handles('value', 'MemberExpression')
+    def _valueOfMember(walk, node, context):
+        # Dereference a class instance for a variable
+        reference = context.lookup(node.object.name)
+        prop = reference.lookup(node.property.name)
+        walk.analyzer._load(prop)
+        return prop.get_value()
+
+    @staticmethod
+    @Walker.handles('value', 'UnaryExpression')
+    def _valueOfUnary(walk, node, context):
+        operation = Value.UNARY_OPERATORS.get(node.operator)
+        if operation is None:
+            return None
+
+        return operation((yield ('value', node.argument, context)))
+
+    @staticmethod
+    @Walker.handles('value', 'BinaryExpression')
+    def _valueOfBinary(walk, node, context):
+        left = yield ('value', node.left, context)
+        right = yield ('value', node.right, context)
+
+        operation = Value.BINARY_OPERATORS.get(node.operator)
+        if operation is None or left is None or right is None:
+            return None
+
+        return operation(left, right)
+
+    @staticmethod
+    @Walker.handles('value', 'ConditionalExpression')
+    def _valueOfConditional(walk, node, context):
+        test = yield ('value', node.test, context)
+        if test is None or test.raised():
+            return test
+
+        if test.true():
+            return (yield ('value', node.consequent, context))
+
+        if test.false():
+            return (yield ('value', node.alternate, context))
+
+        # Either side may run (and assign), so join what both give
+        consequent, alternate = yield from walk.analyzer._merge(walk, node, context, [
+            (test, [('value', node.consequent)]),
+            (test.negate(), [('value', node.alternate)]),
+        ], True)
+
+        return Value.join(node, consequent, alternate)
+
+    @staticmethod
+    @Walker.handles('value', 'Literal')
+    def _valueOfLiteral(walk, node, context):
+        # This is the literal value
+        if isinstance(node.value, int):
+            return Value(node, 'int', node.value, context.condition).intern()
+
+        if isinstance(node.value, float):
+            return Value(node, 'float', node.value, context.condition).intern()
 
-        if node.type == "MemberExpression":
-            # Dereference a class instance for a variable
-            reference = context.lookup(node.object.name)
-            return reference.lookup(node.property.name).get_value()
-
-        if node.type == "UnaryExpression":
-            if node.operator == "-":
-                # Negate
-                return -Value.valueOf(node.argument, text, ast, context, base)
-            elif node.operator == "+":
-                # Positive
-                return +Value.valueOf(node.argument, text, ast, context, base)
-
-        if node.type == "BinaryExpression":
-            left = Value.valueOf(node.left, text, ast, context)
-            if left is None:
-                print('left is none')
-                print(node.left)
-            right = Value.valueOf(node.right, text, ast, context)
-
-            if node.operator == "+":
-                return left + right
-            elif node.operator == "-":
-                return left - right
-            elif node.operator == "*":
-                return left * right
-            elif node.operator == "/":
-                return left / right
-            elif node.operator == "<":
-                return left < right
-            elif node.operator == ">":
-                return left > right
-            elif node.operator == "==":
-                return left == right
-            elif node.operator == "===":
-                # TODO: this is a bit more special than this
-                return left == right
-            elif node.operator == "!=":
-                return left != right
-            elif node.operator == ">=":
-                return left >= right
-            elif node.operator == "<=":
-                return left <= right
-
-        if node.type == "Literal":
-            # This is the literal value
-            if isinstance(node.value, int):
-                return Value(node, 'int', node.value, context.condition)
-
-            if isinstance(node.value, float):
-                return Value(node, 'float', node.value, context.condition)
-
-            if isinstance(node.value, str):
-                return Value(node, 'string', node.value, context.condition)
+        if isinstance(node.value, str):
+            return Value(node, 'string', node.value, context.condition).intern()
 
         return None
@@ -1,5 +1,5 @@
 # Main imports
-import os, sys
+import os, time
 
 # Logging
 import logging
@@ -7,6 +7,15 @@ import logging
 # Flask
 from flask import Flask
 from flask import render_template
+from flask import request, jsonify
+
+# Futures
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# Analysis
+from lib.analysis import worker
+from lib.analysis.pool import Pool, Saturated
 
 def create_app(test_config=None):
     # create and configure the app
@@ -14,6 +23,12 @@ def create_app(test_config=None):
     app.config.from_mapping(
         SECRET_KEY='dev',
         DATABASE=os.path.join(app.instance_path, 'flaskr.sqlite'),
+
+        # Analysis workers, how many submissions may wait for one and how
+        # long (in seconds) a request waits for its results
+        ANALYZE_WORKERS=int(os.getenv('ANALYZE_WORKERS', 0)) or None,
+        ANALYZE_QUEUE=int(os.getenv('ANALYZE_QUEUE', 64)),
+        ANALYZE_TIMEOUT=float(os.getenv('ANALYZE_TIMEOUT', 10)),
     )
 
     if test_config is None:
@@ -35,8 +50,77 @@ def create_app(test_config=None):
     logging.log(100, f"Setting up application. Logging level={log_level}")
     logging.basicConfig(format='%(asctime)s: %(levelname)s:%(name)s:%(message)s', level=log_level)
 
+    # The warm analysis workers (started by the first request, if not before)
+    app.pool = Pool(workers=app.config['ANALYZE_WORKERS'], queue=app.config['ANALYZE_QUEUE'])
+
     @app.route('/')
     def root():
         return render_template("index.html")
 
+    @app.route('/analyze', methods=['POST'])
+    def analyze():
+        """ Analyzes and grades one submission, or a list of them.
+
+        Takes either a single submission or {"submissions": [...]} and
+        responds with the result (or list of results) in the same shape.
+        """
+        body = request.get_json(silent=True)
+
+        batched = isinstance(body, dict) and 'submissions' in body
+        submissions = body['submissions'] if batched else [body]
+        if not isinstance(submissions, list) or not all(isinstance(item, dict) for item in submissions):
+            return jsonify(error="expected a submission or a list of submissions"), 400
+
+        timeout = app.config['ANALYZE_TIMEOUT']
+        try:
+            timeout = float(request.args.get('timeout', timeout))
+        except ValueError:
+            return jsonify(error="timeout must be a number"), 400
+        if not timeout > 0:
+            # Which also turns away nan
+            return jsonify(error="timeout must be a positive number"), 400
+        timeout = min(timeout, app.config['ANALYZE_TIMEOUT'])
+
+        queue = app.config['ANALYZE_QUEUE']
+        if queue and len(submissions) > queue:
+            # This could never be queued, however long the client waits
+            return jsonify(error=f"at most {queue} submissions may be sent at once"), 413
+
+        try:
+            futures = app.pool.submit(submissions)
+        except Saturated as e:
+            return jsonify(error=str(e)), 429, {'Retry-After': '1'}
+
+        deadline = time.monotonic() + timeout
+        results = []
+        try:
+            for submission, future in zip(submissions, futures):
+                try:
+                    results.append(future.result(timeout=max(0, deadline - time.monotonic())))
+                except TimeoutError:
+                    raise
+                except BrokenProcessPool as e:
+                    # A worker died: the next request gets new ones
+                    app.pool.recover()
+                    results.append(worker.failed(submission, e))
+                except Exception as e:
+                    logging.exception("Analysis of a submission failed")
+                    results.append(worker.failed(submission, e))
+        except TimeoutError:
+            for future in futures:
+                future.cancel()
+            return jsonify(error=f"analysis took longer than {timeout} seconds"), 503, {'Retry-After': '1'}
+
+        # Failures are told to the client, but how they came about is only
+        # for the logs
+        for result in results:
+            trace = result.pop('traceback', None)
+            if trace is not None:
+                logging.error(f"Analysis of submission {result['id']} failed:\n{trace}")
+
+        if batched:
+            return jsonify(results=results)
+
+        return jsonify(results[0])
+
     return app
@@ -0,0 +1,20 @@
+# vim: ts=4:sw=4
+""" Serves the application (and its /analyze endpoint) with waitress.
+"""
+
+import os
+
+from waitress import serve
+
+from src import create_app
+
+
+if __name__ == '__main__':
+    app = create_app()
+    app.pool.start()
+
+    try:
+        serve(app, host=os.getenv('HOST', '0.0.0.0'), port=int(os.getenv('PORT', 8080)),
+              threads=int(os.getenv('THREADS', 8)))
+    finally:
+        app.pool.shutdown()
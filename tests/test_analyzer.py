@@ -0,0 +1,14 @@
+# vim: ts=4:sw=4
+import pytest
+
+from lib.analysis.analyzer import Analyzer
+
+
+@pytest.mark.parametrize('code', [
+    'let a = 1 + zzz;',
+    'let a = zzz + 1;',
+])
+def test_unknown_operands(code):
+    ctx = Analyzer(code).annotate()
+
+    assert ctx.lookup('a') is not None
@@ -0,0 +1,24 @@
+# vim: ts=4:sw=4
+from lib.analysis.fingerprint import Fingerprint
+
+
+def test_renamed_locals_share_a_fingerprint():
+    a = Fingerprint("function f(x) { var y = x; return y; } f(1);")
+    b = Fingerprint("function f(q) {  var z = q; return z; } // different\nf(1);")
+
+    assert a.digest == b.digest
+
+
+def test_globals_keep_their_names():
+    a = Fingerprint("var s = Sprite();")
+    b = Fingerprint("var s = Q();")
+
+    assert a.digest != b.digest
+
+
+def test_block_bindings_are_not_confused_with_globals():
+    # Sprite() refers to the global Sprite here, but to nothing with Q
+    a = Fingerprint("function f() { { let Sprite = 1; } let s = Sprite(); } f();")
+    b = Fingerprint("function f() { { let Q = 1; } let s = Q(); } f();")
+
+    assert a.digest != b.digest
@@ -0,0 +1,42 @@
+# vim: ts=4:sw=4
+import math
+import operator
+
+import pytest
+
+from lib.values.arithmetic import Arithmetic
+from lib.values.interval import Interval
+from lib.values.value import Value
+
+
+def test_division_by_a_range_from_zero():
+    ret = Interval(3, 4) / Interval(0, 5)
+
+    assert ret.low == 3 / 5
+    assert ret.high == math.inf
+
+
+def test_division_by_a_range_to_zero():
+    ret = Interval(-5, -3) / Interval(-5, 0)
+
+    assert ret.low == 3 / 5
+    assert ret.high == math.inf
+
+
+def test_division_by_a_range_around_zero():
+    ret = Interval(3, 4) / Interval(-1, 1)
+
+    assert ret.low == -math.inf
+    assert ret.high == math.inf
+
+
+def test_remainder_by_a_range_containing_zero():
+    with pytest.raises(ZeroDivisionError):
+        Arithmetic.remainder(Interval(3, 4), Interval(0, 2))
+
+    a = Value(None)
+    a.add('int', Interval(3, 4))
+    b = Value(None)
+    b.add('int', Interval(0, 2))
+
+    assert 'variant' in a.performBinaryOperation(b, operator.mod).type()